@@ -0,0 +1,156 @@
+"""Precomputed aggregates for the Metrics & Demographics and Descriptive tabs.
+
+Every number those tabs show is a fixed aggregate over the full dataset. They
+are computed once at ingest time, stored as a small JSON file keyed by the
+dataset version and rendered from there instead of scanning the table on
+every rerun. The counts and means behind the static Diagnostic charts
+(DIAGNOSTIC_AGGREGATIONS) are stored the same way, as aggregation.fold()
+totals.
+
+Means are kept as sums and counts of the non-missing values, so that they
+can be combined exactly and skip missing values like Series.mean().
+"""
+import json
+import os
+
+import pandas as pd
+
+import aggregation
+
+# Columns whose value counts are shown as charts
+VALUE_COUNT_COLUMNS = ['gender', 'age', 'race', 'Admissiontype', 'Discharge_type', 'Diagnosis1']
+
+# Numeric columns averaged on the KPI cards
+MEAN_COLUMNS = ['time_in_hospital', 'num_lab_procedures', 'num_medications']
+
+LAB_VS_MEDICATIONS_COLUMNS = ['num_lab_procedures', 'num_medications', 'readmitted']
+
+# Columns whose readmission proportions are charted
+PROPORTION_COLUMNS = ['HospitalStayLength', 'age_group']
+
+# Aggregations behind the static Diagnostic charts, over every encounter;
+# charts of a subset (readmitted or medicated patients) group by the filter
+# column too and slice it
+DIAGNOSTIC_AGGREGATIONS = [
+    aggregation.count('readmitted_diagnoses', 'readmitted', 'Diagnosis'),
+    aggregation.mean('outpatient_by_a1c', 'Num_Outpatient', 'A1CResult', 'readmitted'),
+    aggregation.count('lab_procedures', 'Diabetes_Med', 'readmitted', 'num_lab_procedures'),
+    aggregation.count('lab_vs_medications', 'Diabetes_Med', *LAB_VS_MEDICATIONS_COLUMNS),
+    *[aggregation.count(f'readmitted_by_{column}', column, 'readmitted') for column in PROPORTION_COLUMNS],
+]
+
+# Bumped whenever the summary layout changes; older summaries are rebuilt
+SUMMARY_FORMAT = 3
+
+# Columns needed to build the summary
+SUMMARY_COLUMNS = sorted(set(VALUE_COUNT_COLUMNS + MEAN_COLUMNS + ['readmitted', 'Diabetes_Med', 'Medication'] +
+                             aggregation.input_columns(DIAGNOSTIC_AGGREGATIONS)))
+
+
+def summary_path(csv_path):
+    """Returns the summary file path for `csv_path`."""
+    return os.path.splitext(csv_path)[0] + '.summary.json'
+
+
+def _counts(series):
+    """Returns value counts as [value, count] pairs, most frequent first."""
+    counts = series.value_counts()
+    return [[value, int(count)] for value, count in counts.items() if count > 0]
+
+
+def build_summary(data, version):
+    """Computes the summary aggregates for `data`."""
+    medicated = data[data['Diabetes_Med'] == 'Yes']
+    by_age = data.groupby('age', observed=True)['time_in_hospital'].agg(['sum', 'count'])
+
+    return {
+        'format': SUMMARY_FORMAT,
+        'version': version,
+        'total': len(data),
+        'readmitted_yes': int((data['readmitted'] == 'Yes').sum()),
+        'sums': {column: float(data[column].sum()) for column in MEAN_COLUMNS},
+        'counts': {column: int(data[column].count()) for column in MEAN_COLUMNS},
+        'value_counts': {column: _counts(data[column]) for column in VALUE_COUNT_COLUMNS},
+        'medication_counts': _counts(medicated['Medication']),
+        'time_by_age': [[age, float(row['sum']), int(row['count'])] for age, row in by_age.iterrows()],
+        'diagnostic': aggregation.fold(data, DIAGNOSTIC_AGGREGATIONS),
+    }
+
+
+def _merge_counts(left, right):
+    """Adds two lists of [value, count] pairs, most frequent first."""
+    totals = dict(left)
+    for value, count in right:
+        totals[value] = totals.get(value, 0) + count
+    return [[value, count] for value, count in sorted(totals.items(), key=lambda pair: -pair[1])]
+
+
+def _merge_diagnostic(left, right):
+    """Combines the Diagnostic totals of two summaries; None if either lacks them."""
+    if left is None or right is None:
+        return None
+    return aggregation.merge_folds(left, right)
+
+
+def merge_summaries(left, right, version):
+    """Combines the summaries of two disjoint sets of encounters."""
+    time_by_age = {age: [total, count] for age, total, count in left['time_by_age']}
+    for age, total, count in right['time_by_age']:
+        previous = time_by_age.get(age, [0, 0])
+        time_by_age[age] = [previous[0] + total, previous[1] + count]
+
+    return {
+        'format': SUMMARY_FORMAT,
+        'version': version,
+        'total': left['total'] + right['total'],
+        'readmitted_yes': left['readmitted_yes'] + right['readmitted_yes'],
+        'sums': {column: left['sums'][column] + right['sums'][column] for column in MEAN_COLUMNS},
+        'counts': {column: left['counts'][column] + right['counts'][column] for column in MEAN_COLUMNS},
+        'value_counts': {column: _merge_counts(left['value_counts'][column], right['value_counts'][column])
+                         for column in VALUE_COUNT_COLUMNS},
+        'medication_counts': _merge_counts(left['medication_counts'], right['medication_counts']),
+        'time_by_age': [[age, total, count] for age, (total, count) in sorted(time_by_age.items())],
+        'diagnostic': _merge_diagnostic(left['diagnostic'], right['diagnostic']),
+    }
+
+
+def write_summary(summary, path):
+    """Writes `summary` to `path` atomically."""
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(summary, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def read_summary(path, version):
+    """Returns the summary stored at `path`, or None if missing, stale or in an older format."""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        summary = json.load(f)
+    if summary.get('format') != SUMMARY_FORMAT or summary.get('version') != version:
+        return None
+    return summary
+
+
+def value_counts(summary, column):
+    """Returns the stored value counts of `column` as a Series, like Series.value_counts()."""
+    pairs = summary['value_counts'][column]
+    return pd.Series([count for _, count in pairs], index=pd.Index([value for value, _ in pairs], name=column))
+
+
+def readmitted_percentage(summary):
+    """Returns the share of readmitted encounters, in percent."""
+    return summary['readmitted_yes'] / summary['total'] * 100
+
+
+def mean(summary, column):
+    """Returns the mean of `column` over its non-missing values, like Series.mean()."""
+    return summary['sums'][column] / summary['counts'][column]
+
+
+def diagnostic_results(summary):
+    """Returns the DIAGNOSTIC_AGGREGATIONS results stored in `summary`, or None if it lacks them."""
+    if summary['diagnostic'] is None:
+        return None
+    return aggregation.finish(summary['diagnostic'], DIAGNOSTIC_AGGREGATIONS)
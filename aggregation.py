@@ -0,0 +1,223 @@
+"""Multi-aggregation engine for the Diagnostic view.
+
+A view declares the counts and means it needs, e.g.
+
+    count('stay_length', 'HospitalStayLength', 'readmitted')
+    mean('outpatient_by_a1c', 'Num_Outpatient', 'A1CResult', 'readmitted')
+
+and run() computes all of them together: every grouping column is encoded
+to integer codes once per call, or taken from the codes the loader keeps per
+dataset version (``data_loader.load_codes``), and each aggregation is a
+single np.bincount over the combined codes. There are no per-aggregation
+filtered copies or group-by frames. Filtered subsets pass the matching row
+positions, for instance from the bitmap index, which select from the codes
+before they are widened for the combined key.
+
+Results are Series indexed like the equivalent
+``groupby(by, observed=True).size()`` or ``.mean()``, so they can be
+unstacked or reset the same way.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+Aggregation = namedtuple('Aggregation', ['name', 'by', 'value'])
+
+
+def count(name, *by):
+    """Declares a row count grouped by the `by` columns."""
+    return Aggregation(name, by, None)
+
+
+def mean(name, value, *by):
+    """Declares the mean of `value` grouped by the `by` columns."""
+    return Aggregation(name, by, value)
+
+
+def encode(series):
+    """Returns integer codes and the sorted labels they refer to (-1 for missing).
+
+    Categorical codes keep their narrow dtype.
+    """
+    if hasattr(series, 'cat'):
+        return series.cat.codes.to_numpy(), series.cat.categories
+    return pd.factorize(series, sort=True)
+
+
+def _group_index(labels, by, observed):
+    """Returns the index of the observed groups, like groupby(observed=True)."""
+    if len(by) == 1:
+        return pd.Index(labels[0], name=by[0])[observed]
+    return pd.MultiIndex.from_product(labels, names=list(by))[observed]
+
+
+def group_columns(aggregations):
+    """Returns the columns `aggregations` group by."""
+    return sorted({column for aggregation in aggregations for column in aggregation.by})
+
+
+def input_columns(aggregations):
+    """Returns every column `aggregations` read."""
+    values = [aggregation.value for aggregation in aggregations if aggregation.value is not None]
+    return sorted(set(group_columns(aggregations)) | set(values))
+
+
+def _encode_rows(data, aggregations, positions=None, codes=None):
+    """Returns {column: (int64 codes of the selected rows, labels)} for the columns `aggregations` group by."""
+    codes = codes or {}
+    encoded = {}
+    for column in group_columns(aggregations):
+        column_codes, labels = codes[column] if column in codes else encode(data[column])
+        if positions is not None:
+            column_codes = column_codes[positions]
+        encoded[column] = (column_codes.astype(np.int64), labels)
+    return encoded
+
+
+def _totals(data, aggregation, encoded, positions=None):
+    """Returns the group labels and, per combination of group values, the row count and the
+    sum and count of the non-missing values (None for a count aggregation)."""
+    codes = [encoded[column][0] for column in aggregation.by]
+    labels = [encoded[column][1] for column in aggregation.by]
+
+    # Mixed-radix key: one integer per combination of group values
+    key = np.zeros(len(codes[0]), dtype=np.int64)
+    valid = np.ones(len(codes[0]), dtype=bool)
+    for column_codes, column_labels in zip(codes, labels):
+        key = key * len(column_labels) + column_codes
+        valid &= column_codes >= 0
+    num_groups = int(np.prod([len(column_labels) for column_labels in labels]))
+
+    counts = np.bincount(key[valid], minlength=num_groups)
+    if aggregation.value is None:
+        return labels, counts, None, None
+    values = data[aggregation.value].to_numpy(dtype=np.float64)
+    if positions is not None:
+        values = values[positions]
+    # Missing values are skipped, as in groupby().mean()
+    present = valid & ~np.isnan(values)
+    sums = np.bincount(key[present], weights=values[present], minlength=num_groups)
+    value_counts = np.bincount(key[present], minlength=num_groups)
+    return labels, counts, sums, value_counts
+
+
+def _result(aggregation, labels, counts, sums, value_counts):
+    """Returns the Series of the observed groups."""
+    observed = np.flatnonzero(counts)
+    index = _group_index(labels, aggregation.by, observed)
+    if aggregation.value is None:
+        return pd.Series(counts[observed], index=index)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums[observed] / value_counts[observed]
+    return pd.Series(means, index=index, name=aggregation.value)
+
+
+def run(data, aggregations, positions=None, codes=None):
+    """Computes `aggregations` over `data` and returns a dict keyed by name.
+
+    If `positions` is given, only those rows are aggregated. `codes` maps a
+    column to its encode() result over every row of `data`; the columns it
+    does not cover are encoded here.
+    """
+    encoded = _encode_rows(data, aggregations, positions, codes)
+    return {aggregation.name: _result(aggregation, *_totals(data, aggregation, encoded, positions))
+            for aggregation in aggregations}
+
+
+def fold(data, aggregations):
+    """Returns the totals behind `aggregations` over `data`, keyed by name.
+
+    Row counts, sums and non-missing counts add up over disjoint sets of
+    rows, so data read in chunks is aggregated one chunk at a time with
+    merge_folds() and turned into run() results with finish(). Each entry
+    holds the labels of its group columns and one [*group values, rows]
+    list per observed group, followed by the sum and count of the values
+    for a mean; the totals are plain lists, to be stored as JSON.
+    """
+    encoded = _encode_rows(data, aggregations)
+    folded = {}
+    for aggregation in aggregations:
+        labels, counts, sums, value_counts = _totals(data, aggregation, encoded)
+        observed = np.flatnonzero(counts)
+        label_lists = [column_labels.tolist() for column_labels in labels]
+        positions = np.unravel_index(observed, [len(column_labels) for column_labels in labels])
+        keys = zip(*[[column_labels[code] for code in column_positions.tolist()]
+                     for column_labels, column_positions in zip(label_lists, positions)])
+        totals = [counts[observed].tolist()]
+        if aggregation.value is not None:
+            totals += [sums[observed].tolist(), value_counts[observed].tolist()]
+        groups = [list(key) + list(group_totals) for key, *group_totals in zip(keys, *totals)]
+        folded[aggregation.name] = {'labels': label_lists, 'groups': groups}
+    return folded
+
+
+def merge_folds(left, right):
+    """Combines the fold() totals of two disjoint sets of rows."""
+    merged = {}
+    for name, left_totals in left.items():
+        right_totals = right[name]
+        width = len(left_totals['labels'])
+        groups = {}
+        for group in left_totals['groups'] + right_totals['groups']:
+            key = tuple(group[:width])
+            previous = groups.get(key)
+            groups[key] = list(group[width:]) if previous is None else [a + b for a, b in zip(previous, group[width:])]
+        merged[name] = {
+            'labels': [sorted(set(l) | set(r)) for l, r in zip(left_totals['labels'], right_totals['labels'])],
+            'groups': [list(key) + totals for key, totals in groups.items()],
+        }
+    return merged
+
+
+def finish(folded, aggregations):
+    """Returns the results of `aggregations` from their fold() totals, as run() returns them."""
+    results = {}
+    for aggregation in aggregations:
+        totals = folded[aggregation.name]
+        labels = [pd.Index(column_labels) for column_labels in totals['labels']]
+        width = len(labels)
+        num_groups = int(np.prod([len(column_labels) for column_labels in labels]))
+        counts = np.zeros(num_groups, dtype=np.int64)
+        sums = value_counts = None
+        if aggregation.value is not None:
+            sums = np.zeros(num_groups)
+            value_counts = np.zeros(num_groups, dtype=np.int64)
+        if totals['groups']:
+            columns = list(zip(*totals['groups']))
+            key = np.zeros(len(totals['groups']), dtype=np.int64)
+            for column_labels, values in zip(labels, columns[:width]):
+                key = key * len(column_labels) + column_labels.get_indexer(list(values))
+            counts[key] = columns[width]
+            if aggregation.value is not None:
+                sums[key] = columns[width + 1]
+                value_counts[key] = columns[width + 2]
+        results[aggregation.name] = _result(aggregation, labels, counts, sums, value_counts)
+    return results
+
+
+def combinations(data, columns, positions=None, codes=None):
+    """Returns each distinct combination of `columns` with its row count, in a 'count' column.
+
+    Unlike run(), rows with missing values are kept: they form their own
+    combinations, with NaN for the missing values. `positions` and `codes`
+    are as for run(); the value columns are categoricals.
+    """
+    codes = codes or {}
+    labels = []
+    key = 0
+    for column in columns:
+        column_codes, column_labels = codes[column] if column in codes else encode(data[column])
+        if positions is not None:
+            column_codes = column_codes[positions]
+        # Shifted by one, so that missing values get code 0
+        key = key * (len(column_labels) + 1) + column_codes.astype(np.int64) + 1
+        labels.append(column_labels)
+    shape = [len(column_labels) + 1 for column_labels in labels]
+
+    counts = np.bincount(key, minlength=int(np.prod(shape)))
+    observed = np.flatnonzero(counts)
+    result = pd.DataFrame({column: pd.Categorical.from_codes(column_codes - 1, categories=column_labels)
+                           for column, column_labels, column_codes in zip(columns, labels, np.unravel_index(observed, shape))})
+    result['count'] = counts[observed]
+    return result
@@ -0,0 +1,262 @@
+"""Data behind each dashboard chart, computed without Streamlit.
+
+Every chart function returns a plain DataFrame that the dashboard turns
+into one chart. Summary-backed charts read the precomputed aggregates (see
+``aggregates.py``). Row-level charts slice the results of a query backend run
+(see ``query_backend.py`` and ``aggregation.py``): a view declares every
+count and mean its charts need and runs them together, once per filter
+state, so the filter and the column encoding are applied once:
+
+    results = diagnostic_results(backend)
+    top_comorbidities(results)
+    readmission_proportion(results, 'age_group')
+
+The dashboard caches each run, not each chart.
+
+The same functions serve the dashboard, batch jobs and benchmarks:
+
+    python analytics.py OUTPUT_DIR [--backend pandas] [--workers N]
+
+writes the data of every unfiltered chart to OUTPUT_DIR as CSV files,
+computing up to N charts in parallel.
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+import aggregates
+import aggregation
+import risk_model
+
+# Columns each tab reads; only these are materialized by the pandas backend
+DESCRIPTIVE_COLUMNS = ['time_in_hospital']
+DIAGNOSTIC_COLUMNS = ['readmitted', 'Diagnosis', 'A1CResult', 'Num_Outpatient', 'Diabetes_Med', 'Change',
+                      'insulin', 'metformin', 'glimepiride', 'num_lab_procedures', 'num_medications',
+                      'HospitalStayLength', 'age_group', 'age', 'gender', 'Diagnosis1', 'Admissiontype']
+
+# Medications whose status is charted for severe patients
+SEVERE_MEDICATIONS = ['insulin', 'metformin', 'glimepiride']
+
+MEDICATED = {'Diabetes_Med': 'Yes'}
+
+# The static Diagnostic charts are declared with the summary, which holds their totals
+LAB_VS_MEDICATIONS_COLUMNS = aggregates.LAB_VS_MEDICATIONS_COLUMNS
+PROPORTION_COLUMNS = aggregates.PROPORTION_COLUMNS
+DIAGNOSTIC_AGGREGATIONS = aggregates.DIAGNOSTIC_AGGREGATIONS
+
+# Aggregations behind the readmission filter panel, run once per readmission filter
+READMISSION_FILTER_AGGREGATIONS = [
+    aggregation.count('a1c_change', 'A1CResult', 'Change'),
+    *[aggregation.count(medication, 'A1CResult', medication) for medication in SEVERE_MEDICATIONS],
+]
+
+# Width of the predicted risk bins, in percentage points
+RISK_BIN_PERCENT = 0.5
+
+# Bootstrap behind the confidence intervals of the proportion charts
+BOOTSTRAP_RESAMPLES = 10_000
+CONFIDENCE = 0.95
+
+
+# Descriptive Analysis (precomputed summary)
+
+def average_time_by_age(summary):
+    """Average days in hospital per age band."""
+    average_time = pd.DataFrame(summary['time_by_age'], columns=['age', 'total', 'count'])
+    average_time['time_in_hospital'] = average_time['total'] / average_time['count']
+    return average_time
+
+
+def admission_types(summary):
+    """Encounters per admission type, least frequent first."""
+    counts = aggregates.value_counts(summary, 'Admissiontype')
+    data = pd.DataFrame({'Admission Type': counts.index, 'Count': counts.values})
+    return data.sort_values('Count', ascending=True)
+
+
+def discharge_types(summary):
+    """Encounters per discharge type, most frequent first."""
+    counts = aggregates.value_counts(summary, 'Discharge_type')
+    return pd.DataFrame({'Discharge_type': counts.index, 'Count': counts.values})
+
+
+def top_medications(summary, n=18):
+    """The `n` medications prescribed most often to patients on diabetes medication."""
+    counts = pd.DataFrame(summary['medication_counts'], columns=['Medication', 'Count'])
+    return counts.sort_values('Count', ascending=False).head(n)
+
+
+def primary_diagnosis(summary):
+    """Encounters and share of encounters per primary diagnosis, most frequent first."""
+    counts = aggregates.value_counts(summary, 'Diagnosis1')
+    data = pd.DataFrame({'Diagnosis': counts.index, 'Count': counts.values})
+    data['Percentage'] = data['Count'] / data['Count'].sum() * 100
+    return data.sort_values('Count', ascending=False)
+
+
+def length_of_stay(backend):
+    """Encounters per number of days in hospital, shortest stay first."""
+    counts = backend.run([aggregation.count('days', 'time_in_hospital')])['days']
+    return counts.reset_index(name='count')
+
+
+# Diagnostic analysis (query backend)
+
+def diagnostic_results(backend, summary=None):
+    """Returns DIAGNOSTIC_AGGREGATIONS over every encounter.
+
+    They are read from `summary` when it holds them, else run on `backend`
+    in one pass.
+    """
+    results = aggregates.diagnostic_results(summary) if summary is not None else None
+    if results is None:
+        results = backend.run(DIAGNOSTIC_AGGREGATIONS)
+    return results
+
+
+def readmission_filter_results(backend, readmitted):
+    """Runs READMISSION_FILTER_AGGREGATIONS over the patients on diabetes medication with status `readmitted`."""
+    return backend.run(READMISSION_FILTER_AGGREGATIONS, _medicated_with(readmitted))
+
+
+def top_comorbidities(results, n=10):
+    """The `n` most common comorbidities among readmitted patients."""
+    counts = results['readmitted_diagnoses'].loc['Yes']
+    top = counts.sort_values(ascending=False)[:n]
+    return pd.DataFrame({'Diagnosis': top.index, 'Count': top.values})
+
+
+def outpatient_by_a1c(results):
+    """Average outpatient visits per A1C result and readmission status."""
+    return results['outpatient_by_a1c'].reset_index()
+
+
+def lab_procedures_by_readmission(results):
+    """Patients on diabetes medication per number of lab procedures and readmission status."""
+    return results['lab_procedures'].loc['Yes'].reset_index(name='count')
+
+
+def readmission_proportion(results, column):
+    """Share of readmitted ('Yes') and not readmitted ('No') encounters per value of `column`."""
+    counts = results[f'readmitted_by_{column}'].unstack()
+    return counts.div(counts.sum(axis=1), axis=0)
+
+
+def bootstrap_intervals(counts, resamples=BOOTSTRAP_RESAMPLES, confidence=CONFIDENCE, seed=0):
+    """Percentile bootstrap intervals of the row proportions of `counts` (groups x outcomes).
+
+    Each group is resampled from a multinomial with its own size and observed
+    proportions, all resamples of a group in one draw, so the cost does not
+    depend on the number of encounters. Returns {'lower': ..., 'upper': ...},
+    frames shaped like `counts`.
+    """
+    totals = counts.sum(axis=1).to_numpy()
+    proportions = counts.to_numpy(dtype=float) / totals[:, None]
+    tail = (1 - confidence) / 2
+    rng = np.random.default_rng(seed)
+    bounds = np.empty((2,) + proportions.shape)
+    for row, (total, observed) in enumerate(zip(totals, proportions)):
+        resampled = rng.multinomial(total, observed, size=resamples) / total
+        bounds[:, row] = np.quantile(resampled, [tail, 1 - tail], axis=0)
+    return {name: pd.DataFrame(bound, index=counts.index, columns=counts.columns)
+            for name, bound in zip(['lower', 'upper'], bounds)}
+
+
+def readmission_proportion_intervals(results, column):
+    """Bootstrap confidence intervals of readmission_proportion(results, column)."""
+    return bootstrap_intervals(results[f'readmitted_by_{column}'].unstack(fill_value=0))
+
+
+def _medicated_with(readmitted):
+    return {'readmitted': readmitted, **MEDICATED}
+
+
+def a1c_medication_change(results):
+    """Patients on diabetes medication per A1C result (rows) and medication change (columns)."""
+    return results['a1c_change'].unstack()
+
+
+def severe_medication_status(results):
+    """Status of each of SEVERE_MEDICATIONS for patients on diabetes medication with A1C > 8.
+
+    Long format: one row per (Value, Column) with its Count.
+    """
+    counts = {}
+    for medication in SEVERE_MEDICATIONS:
+        medication_counts = results[medication]
+        medication_counts = medication_counts[medication_counts.index.get_level_values('A1CResult') == '>8']
+        counts[medication] = medication_counts.droplevel('A1CResult')
+    count_data = pd.DataFrame(counts).reset_index().rename(columns={'index': 'Value'})
+    return count_data.melt(id_vars='Value', var_name='Column', value_name='Count')
+
+
+def lab_vs_medications_density(results):
+    """Patients on diabetes medication per distinct (lab procedures, medications, readmitted) point."""
+    return results['lab_vs_medications'].loc['Yes'].reset_index(name='count')
+
+
+def lab_vs_medications_points(backend):
+    """Lab procedures, medications and readmission status of every patient on diabetes medication."""
+    return backend.select(LAB_VS_MEDICATIONS_COLUMNS, MEDICATED)
+
+
+def change_admission_readmission(backend, filters):
+    """Encounters matching `filters` per medication change, admission type and readmission status."""
+    declared = aggregation.count('counts', 'Change', 'Admissiontype', 'readmitted')
+    return backend.run([declared], filters)['counts'].reset_index(name='count')
+
+
+def readmission_risk(backend, model, filters):
+    """Encounters matching `filters` per bin of predicted readmission risk (in percent), lowest first."""
+    # Encounters with the same feature values have the same risk: score each combination once
+    combinations = backend.count_combinations(risk_model.FEATURES, filters)
+    scores = model.score(combinations)
+    bins = np.floor(scores * 100 / RISK_BIN_PERCENT).astype(np.int64)
+    counts = np.bincount(bins, weights=combinations['count'].to_numpy(), minlength=1).astype(np.int64)
+    observed = np.flatnonzero(counts)
+    return pd.DataFrame({'risk_percent': observed * RISK_BIN_PERCENT, 'count': counts[observed]})
+
+
+def chart_tasks(summary, results):
+    """Returns a function computing the data of each chart that does not depend on a filter, keyed by chart.
+
+    `results` are the diagnostic_results() the Diagnostic charts slice.
+    """
+    return {
+        'average_time_by_age': lambda: average_time_by_age(summary),
+        'admission_types': lambda: admission_types(summary),
+        'discharge_types': lambda: discharge_types(summary),
+        'top_medications': lambda: top_medications(summary),
+        'primary_diagnosis': lambda: primary_diagnosis(summary),
+        'readmitted_comorbidities': lambda: top_comorbidities(results),
+        'outpatient_by_a1c': lambda: outpatient_by_a1c(results),
+        'lab_procedures_by_readmission': lambda: lab_procedures_by_readmission(results),
+        'lab_procedures_vs_medications': lambda: lab_vs_medications_density(results),
+        'readmission_by_stay_length': lambda: readmission_proportion(results, 'HospitalStayLength'),
+        'readmission_by_age_group': lambda: readmission_proportion(results, 'age_group'),
+    }
+
+
+if __name__ == '__main__':
+    import chart_executor
+    import query_backend
+    from data_loader import load_summary
+    from ingest import DATA_PATH
+
+    parser = argparse.ArgumentParser(description='Write the data behind every unfiltered dashboard chart as CSV.')
+    parser.add_argument('output_dir')
+    parser.add_argument('--csv-path', default=DATA_PATH)
+    parser.add_argument('--backend', default='pandas', choices=query_backend.BACKENDS)
+    parser.add_argument('--workers', type=int, default=chart_executor.DEFAULT_WORKERS,
+                        help='charts computed in parallel')
+    args = parser.parse_args()
+
+    backend = query_backend.get_backend(args.backend, DIAGNOSTIC_COLUMNS, args.csv_path)
+    os.makedirs(args.output_dir, exist_ok=True)
+    tasks = chart_tasks(load_summary(args.csv_path), diagnostic_results(backend))
+    for chart_id, data in chart_executor.compute(tasks, args.workers):
+        path = os.path.join(args.output_dir, f'{chart_id}.csv')
+        data.to_csv(path, index=data.index.name is not None)
+        print(f"Wrote {path}")
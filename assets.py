@@ -0,0 +1,141 @@
+"""Web variants of the dashboard's images, served from Streamlit's static route.
+
+    python assets.py
+
+writes a resized, recompressed WebP variant of each image in IMAGES to
+static/, which Streamlit serves at app/static/ (server.enableStaticServing
+in .streamlit/config.toml). The dashboard embeds the variants by URL, so a
+page view no longer pushes the images over the websocket: the browser
+fetches each one once from the static route and keeps it. Every URL carries
+the variant's content hash as ``?v=``, for which the static route answers
+with a far-future Cache-Control header; a rebuilt image gets a new URL.
+
+The first image() call of a server process builds the variants that are
+missing or older than their source, so a fresh deploy serves them without a
+manual step. If they cannot be written (e.g. a read-only checkout), image()
+falls back to sending the original file with st.image.
+"""
+import argparse
+import hashlib
+import logging
+import os
+import threading
+
+from PIL import Image, ImageSequence
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(ROOT, 'static')
+STATIC_URL = 'app/static'
+
+# Source image -> largest width it is displayed at, in CSS pixels
+IMAGES = {
+    'readmission.jpg': 800,
+    'hospital.gif': 300,
+    'MedicationCartoon.jpg': 640,
+    'A1C_charts_approved.png': 770,
+}
+
+# Photos are compressed lossily at this quality; palette graphics losslessly
+QUALITY = 80
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_checked = False
+
+# Variant path -> (mtime, content hash)
+_hashes = {}
+
+
+def variant_path(name, static_dir=STATIC_DIR):
+    """Returns the path of the web variant of the image `name`."""
+    return os.path.join(static_dir, os.path.splitext(name)[0] + '.webp')
+
+
+def _resized(frame, width):
+    if frame.width <= width:
+        return frame
+    return frame.resize((width, round(frame.height * width / frame.width)), Image.LANCZOS)
+
+
+def build_variant(name, width, source_dir=ROOT, static_dir=STATIC_DIR):
+    """Writes the web variant of `name`, at most `width` pixels wide. Returns its path."""
+    path = variant_path(name, static_dir)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with Image.open(os.path.join(source_dir, name)) as image:
+        options = {'lossless': True} if image.mode == 'P' else {'quality': QUALITY}
+        if getattr(image, 'n_frames', 1) > 1:
+            frames = [_resized(frame.convert('RGBA'), width) for frame in ImageSequence.Iterator(image)]
+            frames[0].save(tmp_path, 'WEBP', save_all=True, append_images=frames[1:], minimize_size=True,
+                           method=6, duration=image.info.get('duration', 100), loop=image.info.get('loop', 0),
+                           **options)
+        else:
+            mode = 'RGBA' if 'transparency' in image.info or image.mode in ('RGBA', 'LA') else 'RGB'
+            _resized(image.convert(mode), width).save(tmp_path, 'WEBP', method=6, **options)
+    os.replace(tmp_path, path)
+    return path
+
+
+def build(source_dir=ROOT, static_dir=STATIC_DIR):
+    """Writes the web variants of all IMAGES. Returns their paths."""
+    os.makedirs(static_dir, exist_ok=True)
+    return [build_variant(name, width, source_dir, static_dir) for name, width in IMAGES.items()]
+
+
+def ensure_built(source_dir=ROOT, static_dir=STATIC_DIR):
+    """Builds the variants that are missing or older than their source, once per process."""
+    global _checked
+    with _lock:
+        if _checked:
+            return
+        _checked = True
+        for name, width in IMAGES.items():
+            path = variant_path(name, static_dir)
+            if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(os.path.join(source_dir, name)):
+                continue
+            try:
+                os.makedirs(static_dir, exist_ok=True)
+                build_variant(name, width, source_dir, static_dir)
+            except OSError as error:
+                logger.warning("Could not build the web variant of %s, serving the original: %s", name, error)
+
+
+def _content_hash(path):
+    mtime = os.path.getmtime(path)
+    cached = _hashes.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path, 'rb') as f:
+            cached = (mtime, hashlib.sha256(f.read()).hexdigest()[:16])
+        _hashes[path] = cached
+    return cached[1]
+
+
+def url(name):
+    """Returns the static URL of the web variant of `name`, or None if it has not been built."""
+    path = variant_path(name)
+    if not os.path.exists(path):
+        return None
+    return f'{STATIC_URL}/{os.path.basename(path)}?v={_content_hash(path)}'
+
+
+def image(name, full_width=False):
+    """Displays the image `name`, stretched to the column width if `full_width`."""
+    import streamlit as st
+
+    ensure_built()
+    source = url(name)
+    if source is None:
+        st.image(os.path.join(ROOT, name), use_column_width=full_width or 'auto')
+        return
+    style = 'width: 100%' if full_width else 'max-width: 100%'
+    st.markdown(f'<img src="{source}" style="{style}">', unsafe_allow_html=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write the web variants of the dashboard images.')
+    parser.add_argument('--static-dir', default=STATIC_DIR)
+    args = parser.parse_args()
+
+    for name, path in zip(IMAGES, build(static_dir=args.static_dir)):
+        print(f"{name}: {os.path.getsize(os.path.join(ROOT, name)) / 1024:.0f} KB -> "
+              f"{path} {os.path.getsize(path) / 1024:.0f} KB")
@@ -0,0 +1,90 @@
+"""Parity check between the query backends.
+
+Renders every view headlessly through Streamlit's app-testing API once per
+backend, including the filter widgets and the raw points toggle of the
+Diagnostic view, and checks that every chart is drawn from the same numbers.
+
+Usage (from the repository root, with the encounters CSV in place):
+    python benchmarks/backend_parity.py
+"""
+import argparse
+import json
+import math
+import os
+import sys
+
+from harness import ROOT, dashboard, plotly_specs
+
+DIAGNOSTIC_VIEW = 'Diagnostic analysis'
+
+
+def chart_data(at, prefix=''):
+    """Returns the trace data of every Plotly chart on the page, keyed by title."""
+    return {prefix + title: json.loads(spec)['data'] for title, spec in plotly_specs(at).items()}
+
+
+def render_all(backend):
+    """Renders every view and filter state with `backend` and returns the chart data."""
+    import caching
+
+    # Both backends share the figure and result caches; start from empty ones
+    caching.figure_cache.clear()
+    caching.result_cache.clear()
+
+    at = dashboard(query_backend=backend)
+    at.run()
+
+    charts = {}
+    for view in at.radio(key='view').options:
+        at.radio(key='view').set_value(view).run()
+        charts.update(chart_data(at, f'{view}: '))
+
+    at.radio(key='view').set_value(DIAGNOSTIC_VIEW).run()
+    at.multiselect[0].set_value(['Yes', 'No'])
+    at.toggle[0].set_value(True)
+    at.selectbox[0].set_value(at.selectbox[0].options[3])
+    at.selectbox[1].set_value('Female')
+    at.selectbox[2].set_value(at.selectbox[2].options[1]).run()
+    charts.update(chart_data(at, 'Filtered: '))
+
+    if at.exception:
+        sys.exit(f"App raised with the {backend} backend: {at.exception[0].message}")
+    return charts
+
+
+def same_values(left, right):
+    """Compares chart data, allowing for float rounding in SQL averages."""
+    if isinstance(left, dict) and isinstance(right, dict):
+        return left.keys() == right.keys() and all(same_values(left[key], right[key]) for key in left)
+    if isinstance(left, list) and isinstance(right, list):
+        return len(left) == len(right) and all(same_values(a, b) for a, b in zip(left, right))
+    if isinstance(left, float) or isinstance(right, float):
+        return isinstance(left, (int, float)) and isinstance(right, (int, float)) and math.isclose(left, right, rel_tol=1e-9)
+    return left == right
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.parse_args()
+
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+
+    import query_backend
+
+    # Every backend is compared with the pandas one
+    expected = render_all('pandas')
+    failed = False
+    for backend in query_backend.BACKENDS[1:]:
+        actual = render_all(backend)
+        mismatched = [title for title in expected if not same_values(expected[title], actual.get(title))]
+        for title in expected:
+            print(f"{'MISMATCH' if title in mismatched else 'ok':>8}  {backend}  {title}")
+        print(f"{backend}: {len(expected) - len(mismatched)}/{len(expected)} charts identical")
+        failed = failed or bool(mismatched) or expected.keys() != actual.keys()
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+"""Benchmarks for the dashboard's data preparation at production sizes.
+
+Generates synthetic encounter extracts (see ``synthetic.py``), then times the
+data preparation behind each dashboard section on its own, without Streamlit
+or chart rendering: ingest, loading, the Metrics cards, the aggregation runs
+of the Diagnostic view and the data of every chart (see ``analytics.py``).
+Diagnostic chart sections time slicing the results of their view's run, which
+is timed as a section of its own. Each section reports its best wall time over
+``--repeat`` runs and its peak traced memory (Python and numpy allocations,
+measured in a separate run with tracemalloc).
+
+Results are appended to ``benchmarks/results.jsonl`` together with the current
+commit; commit that file to keep the history, and pass ``--compare`` to see
+each section against the last run of an earlier commit.
+
+Usage (from the repository root):
+    python benchmarks/chart_benchmarks.py [--rows 100000 1000000 10000000] [--backend pandas] [--compare]
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS_DIR = os.path.join(ROOT, 'benchmarks')
+RESULTS_PATH = os.path.join(BENCHMARKS_DIR, 'results.jsonl')
+DATA_DIR = os.path.join(BENCHMARKS_DIR, 'data')
+
+DEFAULT_ROWS = [100_000, 1_000_000, 10_000_000]
+
+# Filter states used by the filtered Diagnostic panels
+READMITTED_FILTER = ['Yes']
+CROSS_FILTERS = {'gender': 'Female', 'age': '[70-80)', 'Diabetes_Med': 'Yes'}
+
+
+def sections(csv_path, backend_name):
+    """Returns (name, function) for each section, in the order they are run."""
+    import aggregates
+    import analytics
+    import ingest
+    import partitions
+    import query_backend
+    from aggregates import summary_path
+    from bitmap_index import INDEXED_COLUMNS, BitmapIndex
+    from data_loader import clear_cache, load_encounters, load_summary
+
+    def ingest_section():
+        for path in (ingest.sidecar_path(csv_path), summary_path(csv_path)):
+            if os.path.exists(path):
+                os.remove(path)
+        ingest.open_sidecar(csv_path)
+
+    def load_section():
+        # Cold start: open the sidecar and materialize the view columns
+        clear_cache()
+        load_encounters(csv_path, columns=analytics.DIAGNOSTIC_COLUMNS)
+        load_encounters(csv_path, columns=analytics.DESCRIPTIVE_COLUMNS)
+        load_summary(csv_path)
+
+    def metrics_section():
+        summary = load_summary(csv_path)
+        aggregates.readmitted_percentage(summary)
+        for column in ('time_in_hospital', 'num_lab_procedures', 'num_medications'):
+            aggregates.mean(summary, column)
+        for column in ('gender', 'age', 'race'):
+            aggregates.value_counts(summary, column)
+
+    def database_section():
+        # A full build: an up-to-date database would only be checked
+        path = query_backend.database_path(csv_path)
+        if os.path.exists(path):
+            os.remove(path)
+        query_backend.build_database(csv_path)
+
+    def partitions_section():
+        # A full build, as for the database
+        shutil.rmtree(partitions.partitions_dir(csv_path), ignore_errors=True)
+        partitions.build_partitions(csv_path)
+
+    def backend():
+        columns = analytics.DIAGNOSTIC_COLUMNS + analytics.DESCRIPTIVE_COLUMNS
+        return query_backend.get_backend(backend_name, columns, csv_path)
+
+    def summary_chart(function):
+        return lambda: function(load_summary(csv_path))
+
+    def backend_chart(function, *args):
+        return lambda: function(backend(), *args)
+
+    # Results of the latest run of each aggregation section, sliced by the chart sections
+    runs = {}
+
+    def run_section(name, function, *args):
+        def section():
+            runs[name] = function(backend(), *args)
+        return section
+
+    def results_chart(name, function, *args):
+        return lambda: function(runs[name], *args)
+
+    return [
+        ('ingest', ingest_section),
+        ('load', load_section),
+        ('bitmap_index', lambda: BitmapIndex(load_encounters(csv_path, columns=INDEXED_COLUMNS))),
+        *([('sqlite_database', database_section)] if backend_name == 'sqlite' else []),
+        *([('partitions', partitions_section)] if backend_name == 'partitioned' else []),
+        ('metrics', metrics_section),
+        ('average_time_by_age', summary_chart(analytics.average_time_by_age)),
+        ('time_in_hospital_histogram', backend_chart(analytics.length_of_stay)),
+        ('admission_types', summary_chart(analytics.admission_types)),
+        ('discharge_types', summary_chart(analytics.discharge_types)),
+        ('top_medications', summary_chart(analytics.top_medications)),
+        ('primary_diagnosis', summary_chart(analytics.primary_diagnosis)),
+        ('diagnostic_aggregations', run_section('diagnostic', analytics.diagnostic_results)),
+        ('readmitted_comorbidities', results_chart('diagnostic', analytics.top_comorbidities)),
+        ('outpatient_by_a1c', results_chart('diagnostic', analytics.outpatient_by_a1c)),
+        ('readmission_filter_aggregations',
+         run_section('readmission_filter', analytics.readmission_filter_results, READMITTED_FILTER)),
+        ('a1c_medication_change', results_chart('readmission_filter', analytics.a1c_medication_change)),
+        ('severe_medication_status', results_chart('readmission_filter', analytics.severe_medication_status)),
+        ('lab_procedures_by_readmission', results_chart('diagnostic', analytics.lab_procedures_by_readmission)),
+        ('lab_procedures_vs_medications', results_chart('diagnostic', analytics.lab_vs_medications_density)),
+        ('lab_procedures_vs_medications_raw', backend_chart(analytics.lab_vs_medications_points)),
+        ('readmission_by_stay_length', results_chart('diagnostic', analytics.readmission_proportion, 'HospitalStayLength')),
+        ('readmission_by_age_group', results_chart('diagnostic', analytics.readmission_proportion, 'age_group')),
+        ('change_admission_readmission', backend_chart(analytics.change_admission_readmission, CROSS_FILTERS)),
+    ]
+
+
+def measure(function, repeat):
+    """Returns (best wall time in seconds, peak traced memory in MB) of `function`."""
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(timings), peak / 1024 / 1024
+
+
+def current_commit():
+    """Returns the abbreviated HEAD commit, marked dirty if the tree has changes."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return commit + ('-dirty' if dirty else '')
+
+
+def previous_results(path, commit):
+    """Returns the latest result per (rows, backend, section) in `path` recorded by another commit."""
+    previous = {}
+    if not os.path.exists(path):
+        return previous
+    with open(path) as f:
+        for line in f:
+            result = json.loads(line)
+            if result['commit'] != commit:
+                previous[(result['rows'], result['backend'], result['section'])] = result
+    return previous
+
+
+def main():
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, BENCHMARKS_DIR)
+    import query_backend
+    import synthetic
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS)
+    parser.add_argument('--backend', default='pandas', choices=query_backend.BACKENDS)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default=DATA_DIR, help='where generated extracts are kept between runs')
+    parser.add_argument('--results', default=RESULTS_PATH)
+    parser.add_argument('--compare', action='store_true', help='compare with the last run of an earlier commit')
+    args = parser.parse_args()
+
+    commit = current_commit()
+    previous = previous_results(args.results, commit) if args.compare else {}
+    os.makedirs(args.data_dir, exist_ok=True)
+
+    with open(args.results, 'a') as results:
+        for rows in args.rows:
+            csv_path = os.path.join(args.data_dir, f'synthetic_{rows}_{args.seed}.csv')
+            if not os.path.exists(csv_path):
+                print(f"Generating {csv_path}")
+                synthetic.write_csv(csv_path, rows, args.seed)
+
+            print(f"\n{rows:,} rows ({args.backend})")
+            print(f"{'section':<36}{'seconds':>10}{'peak MB':>10}")
+            for name, function in sections(csv_path, args.backend):
+                seconds, peak_mb = measure(function, 1 if name == 'ingest' else args.repeat)
+                result = {
+                    'commit': commit,
+                    'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+                    'rows': rows,
+                    'backend': args.backend,
+                    'section': name,
+                    'seconds': round(seconds, 6),
+                    'peak_mb': round(peak_mb, 3),
+                }
+                results.write(json.dumps(result) + '\n')
+
+                line = f"{name:<36}{seconds:>10.4f}{peak_mb:>10.1f}"
+                before = previous.get((rows, args.backend, name))
+                if before is not None and before['seconds']:
+                    line += f"   {seconds / before['seconds'] - 1:+7.1%} vs {before['commit']}"
+                print(line)
+
+
+if __name__ == '__main__':
+    main()
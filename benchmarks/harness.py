@@ -0,0 +1,44 @@
+"""Helpers shared by the benchmarks that run the dashboard headlessly.
+
+    at = dashboard(query_backend='sqlite')
+    at.run()
+    plotly_specs(at)
+
+dashboard() returns an AppTest of main.py (Streamlit's app-testing API),
+logged in by default; plotly_specs() returns the figure spec of every Plotly
+chart on the page, which is what the websocket carries to the browser.
+"""
+import json
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def rss_mb():
+    """Returns the current resident set size in MB (Linux)."""
+    with open('/proc/self/statm') as f:
+        pages = int(f.read().split()[1])
+    return pages * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+
+
+def dashboard(password='benchmark', logged_in=True, timeout=300, **secrets):
+    """Returns an AppTest of main.py with `secrets` set, past the password form if `logged_in`."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(ROOT, 'main.py'), default_timeout=timeout)
+    at.secrets['password'] = password
+    for key, value in secrets.items():
+        at.secrets[key] = value
+    if logged_in:
+        at.session_state['password_correct'] = True
+    return at
+
+
+def plotly_specs(at):
+    """Returns {title: JSON spec} for every Plotly chart on the page."""
+    specs = {}
+    for element in at.get('plotly_chart'):
+        spec = element.proto.spec
+        title = json.loads(spec).get('layout', {}).get('title', {})
+        specs[str(title.get('text') if isinstance(title, dict) else title)] = spec
+    return specs
@@ -0,0 +1,143 @@
+"""Concurrent-session load test for the dashboard.
+
+Simulates many users hitting the app at once (e.g. at shift change): each
+session runs headlessly through Streamlit's app-testing API and replays a
+scripted visit - log in through the password form, switch views, then
+change the readmission filter and the age, gender and diagnosis selectboxes
+of the Diagnostic view.
+
+The app-testing API is not thread-safe (each run swaps in its own runtime),
+so every session runs in its own process. Each process first warms its
+caches with one visit, then all sessions start their measured visits
+together and compete for the same CPUs. Memory per session is the growth of
+a process's resident memory during its measured visit, i.e. what a session
+adds on top of the warm, shared caches.
+
+Reports rerun latency percentiles, throughput and memory per session.
+
+Usage (from the repository root, with the encounters CSV in place):
+    python benchmarks/load_test.py [--sessions 20] [--rounds 3]
+"""
+import argparse
+import gc
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+from harness import ROOT, dashboard, rss_mb
+
+PASSWORD = 'load-test'
+DIAGNOSTIC_VIEW = 'Diagnostic analysis'
+
+
+class Session:
+    """One simulated user, replaying the scripted visit on its own AppTest."""
+
+    def __init__(self, number, rounds):
+        self.number = number
+        self.rounds = rounds
+        self.latencies = []
+        self.at = dashboard(PASSWORD, logged_in=False, timeout=600)
+
+    def rerun(self, widget=None):
+        """Reruns the script (through `widget` if given) and records the latency."""
+        start = time.perf_counter()
+        (widget or self.at).run()
+        self.latencies.append(time.perf_counter() - start)
+        if self.at.exception:
+            raise RuntimeError(self.at.exception[0].message)
+
+    def visit(self):
+        at = self.at
+        # Log in through check_password
+        self.rerun()
+        self.rerun(at.text_input(key='password').input(PASSWORD))
+
+        rng = np.random.default_rng(self.number)
+        for _ in range(self.rounds):
+            for view in at.radio(key='view').options:
+                self.rerun(at.radio(key='view').set_value(view))
+
+            self.rerun(at.radio(key='view').set_value(DIAGNOSTIC_VIEW))
+            readmitted = at.multiselect[0]
+            selected = rng.permutation(readmitted.options)[:rng.integers(1, len(readmitted.options) + 1)]
+            self.rerun(readmitted.set_value([str(value) for value in selected]))
+            for selectbox in at.selectbox:
+                self.rerun(selectbox.set_value(selectbox.options[rng.integers(len(selectbox.options))]))
+
+
+def run_session(number, rounds, warmup, barrier, results):
+    """Process entry point: warms up, waits for the other sessions, then runs the measured visit."""
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    result = {'number': number, 'latencies': [], 'memory_mb': 0.0, 'error': None}
+    try:
+        # Kept alive until the end so that its teardown does not show up in the measurement
+        warm_session = Session(number, 1)
+        if warmup:
+            warm_session.visit()
+        session = Session(number, rounds)
+        barrier.wait()
+        gc.collect()
+        baseline = rss_mb()
+        try:
+            session.visit()
+        finally:
+            result['latencies'] = session.latencies
+            result['memory_mb'] = rss_mb() - baseline
+    except Exception as error:
+        barrier.abort()
+        result['error'] = f"{type(error).__name__}: {error}"
+    results.put(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=20, help='concurrent sessions')
+    parser.add_argument('--rounds', type=int, default=3, help='scripted visits per session')
+    parser.add_argument('--warmup', action=argparse.BooleanOptionalAction, default=True,
+                        help='warm each process before the measured visits')
+    args = parser.parse_args()
+
+    # Sessions start together once every process has warmed up; the parent
+    # takes part so that the wall clock starts at the same moment.
+    barrier = multiprocessing.Barrier(args.sessions + 1)
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=run_session, args=(number, args.rounds, args.warmup, barrier, results))
+                 for number in range(args.sessions)]
+    for process in processes:
+        process.start()
+    try:
+        barrier.wait()
+    except threading.BrokenBarrierError:
+        pass
+    start = time.perf_counter()
+    sessions = [results.get() for _ in processes]
+    elapsed = time.perf_counter() - start
+    for process in processes:
+        process.join()
+
+    failed = [session for session in sessions if session['error']]
+    for session in failed:
+        print(f"session {session['number']} failed: {session['error']}")
+
+    latencies = np.array([latency for session in sessions for latency in session['latencies']]) * 1000
+    if not len(latencies):
+        sys.exit("No reruns completed")
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    memory = [session['memory_mb'] for session in sessions if not session['error']]
+    print(f"{args.sessions} sessions, {len(latencies)} reruns in {elapsed:.1f}s")
+    print(f"rerun latency: p50 {p50:.0f} ms  p95 {p95:.0f} ms  p99 {p99:.0f} ms  max {latencies.max():.0f} ms")
+    print(f"throughput: {len(latencies) / elapsed:.1f} reruns/s")
+    if memory:
+        print(f"memory per session: mean {np.mean(memory):.1f} MB  max {np.max(memory):.1f} MB")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Memory regression check for repeated dashboard reruns.
+
+Runs the Metrics & Demographics view headlessly many times through Streamlit's
+app-testing API and checks that no matplotlib figures stay open and that
+resident memory stays flat after warm-up.
+
+Usage (from the repository root, with the encounters CSV in place):
+    python benchmarks/memory_regression.py [--reruns 2000] [--max-growth-mb 20]
+"""
+import argparse
+import os
+import sys
+
+from harness import ROOT, dashboard, rss_mb
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--reruns', type=int, default=2000)
+    parser.add_argument('--warmup', type=int, default=50)
+    parser.add_argument('--view', default='Metrics & Demographics')
+    parser.add_argument('--max-growth-mb', type=float, default=20.0)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    import matplotlib.pyplot as plt
+
+    at = dashboard(timeout=120)
+    at.session_state['view'] = args.view
+
+    for _ in range(args.warmup):
+        at.run()
+    if at.exception:
+        sys.exit(f"App raised: {at.exception[0].message}")
+    baseline = rss_mb()
+
+    for i in range(1, args.reruns + 1):
+        at.run()
+        if i % 500 == 0:
+            print(f"{i:>6} reruns  rss={rss_mb():.1f} MB  open figures={len(plt.get_fignums())}")
+
+    growth = rss_mb() - baseline
+    open_figures = len(plt.get_fignums())
+    print(f"RSS growth after {args.reruns} reruns: {growth:.1f} MB, open figures: {open_figures}")
+    if open_figures or growth > args.max_growth_mb:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Payload size report for the dashboard's Plotly charts.
+
+Renders every view headlessly through Streamlit's app-testing API and
+reports the size of each chart's figure spec, which is what the websocket
+carries to the browser. Charts are drawn from server-side counts, so their
+size depends on the number of categories and bins, not on the number of
+encounters. The lab procedures vs medications density plot has one marker
+per distinct (lab procedures, medications, readmitted) point, so it grows
+with the data until every point of that grid is taken (about 85 KB at 1M
+rows) and then stays put.
+
+The raw points of the lab procedures vs medications scatter (the "Show
+individual encounters" toggle) are the one exception and are not rendered
+here.
+
+Usage (from the repository root, with the encounters CSV in place):
+    python benchmarks/payload_sizes.py [--max-kb 128]
+
+Exits with status 1 if a chart is larger than --max-kb.
+"""
+import argparse
+import os
+import sys
+
+from harness import ROOT, dashboard, plotly_specs
+
+
+def chart_sizes(at):
+    """Returns {title: spec bytes} for every Plotly chart on the page."""
+    return {title: len(spec.encode()) for title, spec in plotly_specs(at).items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--max-kb', type=float, default=128.0, help='largest allowed chart payload')
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    at = dashboard()
+    at.run()
+
+    oversized = []
+    for view in at.radio(key='view').options:
+        at.radio(key='view').set_value(view).run()
+        if at.exception:
+            sys.exit(f"App raised: {at.exception[0].message}")
+        sizes = chart_sizes(at)
+        if not sizes:
+            continue
+        print(f"{view} ({sum(sizes.values()) / 1024:.1f} KB)")
+        for title, size in sorted(sizes.items(), key=lambda item: -item[1]):
+            print(f"  {title[:60]:<60} {size / 1024:>8.1f} KB")
+            if size > args.max_kb * 1024:
+                oversized.append(title)
+
+    if oversized:
+        sys.exit(f"Charts over {args.max_kb:.0f} KB: {', '.join(oversized)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Throughput benchmark for the readmission risk scorer.
+
+Trains the risk model on a synthetic extract (see synthetic.py), then scores
+synthetic cohorts of increasing size with the same categorical columns the
+dashboard reads from the Arrow sidecar, and reports the best of --repeat
+runs in encounters per second.
+
+Usage:
+    python benchmarks/risk_scoring.py [--rows 100000 1000000 10000000] [--min-rate 1000000]
+
+Exits with status 1 if the largest cohort scores slower than --min-rate
+encounters per second.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TRAINING_ROWS = 1_000_000
+
+
+class FrameBackend:
+    """The part of the query backend interface that risk_model.train() uses, over one frame."""
+
+    def __init__(self, data):
+        self.data = data
+
+    def select(self, columns, filters=None):
+        return self.data[columns]
+
+
+def cohort(rows, seed):
+    """Returns `rows` synthetic encounters with the model's columns as categoricals."""
+    import risk_model
+    from synthetic import generate
+
+    columns = risk_model.FEATURES + [risk_model.TARGET]
+    return generate(rows, np.random.default_rng(seed))[columns].astype('category')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000, 10_000_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--min-rate', type=float, default=1_000_000, help='encounters per second')
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    import risk_model
+
+    start = time.perf_counter()
+    model = risk_model.RiskModel(risk_model.train(FrameBackend(cohort(TRAINING_ROWS, seed=0))))
+    print(f"trained on {TRAINING_ROWS:,} encounters in {time.perf_counter() - start:.2f}s")
+
+    rate = None
+    for rows in args.rows:
+        data = cohort(rows, seed=1)
+        best = float('inf')
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            model.score(data)
+            best = min(best, time.perf_counter() - start)
+        rate = rows / best
+        print(f"{rows:>12,} encounters  {best * 1000:>9.1f} ms  {rate / 1e6:>6.1f}M encounters/s")
+
+    if rate is not None and rate < args.min_rate:
+        sys.exit(f"Scoring ran at {rate:,.0f} encounters/s, below {args.min_rate:,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Per-session memory budget check for the dashboard.
+
+Every session of a server process reads the same dataset: data_loader keeps
+one copy of each frame, memory-mapped from the Arrow sidecar and read-only,
+and filtered charts work from bitmap-index row positions rather than copied
+subsets. What a session adds on top of that is its own state - widget
+values, the messages of its last rerun and the query results it pulled into
+its cache - so memory grows with concurrent users by a small, roughly fixed
+amount per session rather than by the size of the data.
+
+The budget for that amount is SESSION_BUDGET_MB. This check opens sessions
+one after another in a single process, keeps all of them alive, replays the
+scripted visit of load_test.py in each, and fails when the resident memory
+added per extra session exceeds the budget or when any session caused the
+dataset to be loaded a second time.
+
+Usage (from the repository root, with the encounters CSV in place):
+    python benchmarks/session_memory.py [--sessions 10] [--budget-mb 5]
+"""
+import argparse
+import gc
+import os
+import sys
+
+from harness import ROOT, rss_mb
+from load_test import Session
+
+# Resident memory each additional concurrent session may add to a warm server process
+SESSION_BUDGET_MB = 5.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=10, help='sessions opened after the first')
+    parser.add_argument('--rounds', type=int, default=1, help='scripted visits per session')
+    parser.add_argument('--budget-mb', type=float, default=SESSION_BUDGET_MB)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    import data_loader
+
+    # The first session loads the dataset and warms the shared caches
+    sessions = [Session(0, args.rounds)]
+    sessions[0].visit()
+    gc.collect()
+    baseline = rss_mb()
+    loads = data_loader.loader_stats()['loads']
+
+    for number in range(1, args.sessions + 1):
+        session = Session(number, args.rounds)
+        session.visit()
+        sessions.append(session)
+        gc.collect()
+        print(f"{number:>4} extra sessions  rss={rss_mb():.1f} MB")
+
+    per_session = (rss_mb() - baseline) / args.sessions
+    reloads = data_loader.loader_stats()['loads'] - loads
+    print(f"memory per extra session: {per_session:.1f} MB (budget {args.budget_mb:.1f} MB), "
+          f"dataset reloads: {reloads}")
+    if per_session > args.budget_mb or reloads:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Synthetic encounter tables with the dashboard's schema.
+
+Each column is sampled independently from marginals that approximate the
+public UCI "Diabetes 130-US hospitals" extract the dashboard was built on;
+the derived columns (``age_group``, ``HospitalStayLength``) are computed from
+their source columns. Tables of any size are written in chunks, so the 10M
+row extract never has to fit in memory at once.
+
+Usage:
+    python benchmarks/synthetic.py ROWS OUTPUT.csv [--seed 0]
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+CHUNK_ROWS = 1_000_000
+
+# (values, probabilities) per categorical column
+MARGINALS = {
+    'race': (['Caucasian', 'AfricanAmerican', 'Hispanic', 'Other', 'Asian'],
+             [0.765, 0.193, 0.020, 0.015, 0.007]),
+    'gender': (['Female', 'Male'], [0.538, 0.462]),
+    'age': (['[0-10)', '[10-20)', '[20-30)', '[30-40)', '[40-50)', '[50-60)', '[60-70)', '[70-80)', '[80-90)', '[90-100)'],
+            [0.002, 0.007, 0.016, 0.037, 0.095, 0.170, 0.221, 0.256, 0.169, 0.027]),
+    'Admissiontype': (['Emergency', 'Elective', 'Urgent', 'Not Available'], [0.531, 0.186, 0.182, 0.101]),
+    'Discharge_type': (['Home', 'Transferred', 'Other', 'Expired'], [0.739, 0.177, 0.068, 0.016]),
+    'Diagnosis1': (['Circulatory', 'Other', 'Respiratory', 'Digestive', 'Diabetes', 'Injury', 'Musculoskeletal'],
+                   [0.298, 0.180, 0.142, 0.093, 0.086, 0.068, 0.133]),
+    'Diagnosis': (['Hypertension', 'Heart failure', 'Kidney disease', 'Atrial fibrillation', 'Coronary artery disease',
+                   'Hyperlipidemia', 'COPD', 'Anemia', 'Obesity', 'Depression', 'Pneumonia', 'Urinary tract infection'],
+                  [0.215, 0.135, 0.110, 0.095, 0.090, 0.075, 0.065, 0.055, 0.045, 0.040, 0.040, 0.035]),
+    'A1CResult': (['None', '>8', 'Norm', '>7'], [0.833, 0.081, 0.049, 0.037]),
+    'metformin': (['No', 'Steady', 'Up', 'Down'], [0.804, 0.180, 0.010, 0.006]),
+    'insulin': (['No', 'Steady', 'Down', 'Up'], [0.466, 0.303, 0.120, 0.111]),
+    'glimepiride': (['No', 'Steady', 'Up', 'Down'], [0.949, 0.046, 0.003, 0.002]),
+    'Medication': (['insulin', 'metformin', 'glipizide', 'glyburide', 'pioglitazone', 'rosiglitazone', 'glimepiride',
+                    'repaglinide', 'glyburide-metformin', 'nateglinide', 'acarbose', 'chlorpropamide', 'tolazamide',
+                    'miglitol', 'tolbutamide', 'troglitazone', 'acetohexamide', 'glipizide-metformin'],
+                   [0.430, 0.190, 0.120, 0.100, 0.070, 0.060, 0.050, 0.015, 0.007, 0.007, 0.003, 0.001, 0.001,
+                    0.001, 0.001, 0.001, 0.001, 0.002]),
+    'Change': (['No', 'Ch'], [0.538, 0.462]),
+    'Diabetes_Med': (['Yes', 'No'], [0.770, 0.230]),
+    'readmitted': (['No', 'Yes'], [0.888, 0.112]),
+}
+
+# The dashboard's age groups (see the definitions in the Overview view)
+AGE_GROUPS = {'[0-10)': 'Adolescents', '[10-20)': 'Teenagers', '[20-30)': 'Young adults', '[30-40)': 'Middle adults',
+              '[40-50)': 'Middle adults', '[50-60)': 'Seniors', '[60-70)': 'Seniors', '[70-80)': 'Seniors',
+              '[80-90)': 'Seniors', '[90-100)': 'Seniors'}
+
+# Stays longer than this many days are 'Long Stay'
+LONG_STAY_DAYS = 6
+
+COLUMNS = ['race', 'gender', 'age', 'age_group', 'Admissiontype', 'Discharge_type', 'time_in_hospital',
+           'HospitalStayLength', 'num_lab_procedures', 'num_medications', 'Num_Outpatient', 'Diagnosis1',
+           'Diagnosis', 'A1CResult', 'metformin', 'insulin', 'glimepiride', 'Medication', 'Change',
+           'Diabetes_Med', 'readmitted']
+
+
+def generate(rows, rng):
+    """Returns a DataFrame of `rows` synthetic encounters drawn with `rng`."""
+    data = {}
+    for column, (values, probabilities) in MARGINALS.items():
+        probabilities = np.asarray(probabilities) / np.sum(probabilities)
+        codes = rng.choice(len(values), size=rows, p=probabilities)
+        data[column] = pd.Categorical.from_codes(codes, categories=values)
+
+    time_in_hospital = np.clip(rng.gamma(2.0, 2.2, rows).round().astype(np.int64), 1, 14)
+    data['time_in_hospital'] = time_in_hospital
+    data['HospitalStayLength'] = np.where(time_in_hospital > LONG_STAY_DAYS, 'Long Stay', 'Short Stay')
+    data['num_lab_procedures'] = np.clip(rng.normal(43, 19.7, rows).round().astype(np.int64), 1, 132)
+    data['num_medications'] = np.clip(rng.gamma(4.0, 4.0, rows).round().astype(np.int64), 1, 81)
+    data['Num_Outpatient'] = rng.poisson(0.37, rows)
+    ages = data['age']
+    data['age_group'] = np.array([AGE_GROUPS[age] for age in ages.categories])[ages.codes]
+    return pd.DataFrame(data)[COLUMNS]
+
+
+def write_csv(path, rows, seed=0, chunk_rows=CHUNK_ROWS):
+    """Writes `rows` synthetic encounters to `path` in chunks. Returns `path`."""
+    rng = np.random.default_rng(seed)
+    written = 0
+    with open(path, 'w', newline='') as f:
+        while written < rows:
+            chunk = generate(min(chunk_rows, rows - written), rng)
+            chunk.to_csv(f, index=False, header=written == 0)
+            written += len(chunk)
+    return path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('rows', type=int)
+    parser.add_argument('output')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    print(f"Wrote {write_csv(args.output, args.rows, args.seed)}")
@@ -0,0 +1,62 @@
+"""Bitmap index over the low-cardinality filter columns.
+
+Each (column, value) pair gets a packed bitmap with one bit per row. A filter
+state is answered with bitwise ORs (values of one column) and ANDs (across
+columns) instead of scanning and copying the frame once per filter, and only
+the columns a chart reads are materialized for the matching rows.
+"""
+import numpy as np
+
+# Columns the Diagnostic view filters on
+INDEXED_COLUMNS = ['readmitted', 'Diabetes_Med', 'A1CResult', 'age', 'gender', 'Diagnosis1']
+
+
+def accepted_values(accepted):
+    """Returns a filter value or list of values as a list."""
+    if isinstance(accepted, str) or not hasattr(accepted, '__iter__'):
+        return [accepted]
+    return list(accepted)
+
+
+class BitmapIndex:
+    """Packed per-value bitmaps for `columns` of `data`."""
+
+    def __init__(self, data, columns=INDEXED_COLUMNS):
+        self.num_rows = len(data)
+        self.bitmaps = {}
+        for column in columns:
+            series = data[column]
+            if hasattr(series, 'cat'):
+                codes = series.cat.codes.to_numpy()
+                values = series.cat.categories
+            else:
+                values, codes = np.unique(series.to_numpy(), return_inverse=True)
+            self.bitmaps[column] = {value: np.packbits(codes == code) for code, value in enumerate(values)}
+
+    def all_rows(self):
+        """Returns a bitmap with every row set."""
+        return np.packbits(np.ones(self.num_rows, dtype=bool))
+
+    def mask(self, filters):
+        """Returns the bitmap of rows matching `filters`.
+
+        `filters` maps a column to a value or a list of accepted values; a
+        row matches when it matches every column.
+        """
+        result = self.all_rows()
+        empty = np.zeros_like(result)
+        for column, accepted in filters.items():
+            column_mask = empty
+            for value in accepted_values(accepted):
+                column_mask = column_mask | self.bitmaps[column].get(value, empty)
+            result = result & column_mask
+        return result
+
+    def positions(self, mask):
+        """Returns the row positions set in `mask`."""
+        return np.flatnonzero(np.unpackbits(mask, count=self.num_rows))
+
+    def take(self, data, mask, columns):
+        """Materializes only `columns` of `data` for the rows set in `mask`."""
+        column_positions = [data.columns.get_loc(column) for column in columns]
+        return data.iloc[self.positions(mask), column_positions]
@@ -0,0 +1,169 @@
+"""In-process caches shared by every session of the dashboard.
+
+Like the dataset loader, these live in an imported module so they survive
+Streamlit reruns and are shared across sessions in the same server process.
+Every lookup is an instrumentation span named after the chart, and the
+hit/miss counters of each cache are exported with the metrics.
+"""
+import io
+import threading
+from collections import OrderedDict
+
+import matplotlib.pyplot as plt
+import plotly.io as pio
+
+from instrumentation import register_counters, span
+
+# Upper bound on the serialized figures kept in memory
+FIGURE_CACHE_BYTES = 64 * 1024 * 1024
+
+# Upper bound on the filtered aggregation results kept in memory
+RESULT_CACHE_BYTES = 32 * 1024 * 1024
+
+
+class LRUCache:
+    """Thread-safe LRU cache bounded by the total size of its values.
+
+    `sizeof` returns the size of a value in bytes; the least recently used
+    entries are evicted once the total exceeds `max_bytes`.
+    """
+
+    def __init__(self, max_bytes, sizeof=len):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                self._misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return self._entries[key][0]
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                # Never cache a value that would evict everything else
+                return
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Returns the cached value for `key`, calling `compute()` on a miss."""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Returns hit/miss counters and current usage."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hit_rate': self._hits / lookups if lookups else 0.0,
+            }
+
+
+def frame_size(frame):
+    """Returns the memory used by a DataFrame or Series (or a dict of them) in bytes."""
+    if isinstance(frame, dict):
+        return sum(frame_size(value) for value in frame.values())
+    usage = frame.memory_usage(deep=True)
+    return int(usage.sum()) if hasattr(usage, 'sum') else int(usage)
+
+
+figure_cache = LRUCache(FIGURE_CACHE_BYTES)
+result_cache = LRUCache(RESULT_CACHE_BYTES, sizeof=frame_size)
+register_counters('figure_cache', figure_cache.stats)
+register_counters('result_cache', result_cache.stats)
+
+
+def cached_figure(chart_id, version, build):
+    """Returns the Plotly figure `chart_id` for dataset `version`.
+
+    `build()` creates the figure on a miss; the figure is stored as Plotly
+    JSON so that its memory footprint is known and bounded.
+    """
+    with span(chart_id):
+        figure_json = figure_cache.get_or_compute((version, chart_id), lambda: build().to_json())
+        return pio.from_json(figure_json)
+
+
+def _freeze(filters):
+    """Returns a hashable, order-independent key for a filter dict."""
+    frozen = []
+    for column, value in sorted(filters.items()):
+        if isinstance(value, (list, tuple, set)):
+            value = tuple(sorted(value))
+        frozen.append((column, value))
+    return tuple(frozen)
+
+
+def cached_result(chart_id, version, filters, compute):
+    """Returns the aggregation `chart_id` for dataset `version` and `filters`.
+
+    `compute()` runs on a miss. Results are shared by every session, so
+    callers must not modify them in place.
+    """
+    with span(chart_id):
+        return result_cache.get_or_compute((version, chart_id, _freeze(filters)), compute)
+
+
+def render_png(fig):
+    """Renders a matplotlib figure to PNG bytes and closes it."""
+    try:
+        buffer = io.BytesIO()
+        # Same settings st.pyplot uses
+        fig.savefig(buffer, format='png', bbox_inches='tight', dpi=200)
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
+
+
+def _build_png(build):
+    """Renders the figure returned by `build()`, closing the figures it opened if it raises."""
+    open_before = set(plt.get_fignums())
+    try:
+        fig = build()
+    except BaseException:
+        for number in set(plt.get_fignums()) - open_before:
+            plt.close(number)
+        raise
+    return render_png(fig)
+
+
+def cached_image(chart_id, version, build):
+    """Returns the PNG rendering of matplotlib chart `chart_id` for dataset `version`.
+
+    `build()` creates the figure on a miss. The figure is always closed,
+    after rendering or when `build()` fails, so pyplot never keeps it alive
+    between reruns.
+    """
+    with span(chart_id):
+        return figure_cache.get_or_compute((version, chart_id), lambda: _build_png(build))
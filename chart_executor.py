@@ -0,0 +1,65 @@
+"""Computes independent charts concurrently.
+
+The static charts of a view do not depend on each other, so they can be
+built at the same time instead of one after another:
+
+    for chart_id, figure in compute({'a': build_a, 'b': build_b}, workers=4):
+        placeholders[chart_id].plotly_chart(figure)
+
+Results are yielded keyed by chart as soon as each one is ready. The work
+runs on a thread pool shared by every session of the server process: the
+group-bys release the GIL in numpy and all threads read the same in-memory
+dataset, which a process pool would have to copy into every worker. Tasks
+must not call Streamlit; they only compute.
+
+With `workers` set to 1 the tasks run one after another on the calling
+thread.
+"""
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+
+import instrumentation
+
+# Default pool size; set chart_workers in secrets.toml to size it to the pod
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
+_lock = threading.Lock()
+_executors = {}
+
+
+def _executor(workers):
+    """Returns the shared thread pool with `workers` threads."""
+    with _lock:
+        executor = _executors.get(workers)
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='chart')
+            _executors[workers] = executor
+        return executor
+
+
+def submit(function, workers=DEFAULT_WORKERS):
+    """Starts computing `function()` and returns its Future."""
+    # Spans opened by the task belong to the submitting rerun
+    function = instrumentation.carry(function)
+    if workers > 1:
+        return _executor(workers).submit(function)
+
+    future = Future()
+    try:
+        future.set_result(function())
+    except Exception as error:
+        future.set_exception(error)
+    return future
+
+
+def completed(futures):
+    """Yields (key, result) for a dict of Futures, in the order they complete."""
+    keys = {future: key for key, future in futures.items()}
+    for future in as_completed(keys):
+        yield keys[future], future.result()
+
+
+def compute(tasks, workers=DEFAULT_WORKERS):
+    """Computes `tasks` ({key: function}) concurrently; yields (key, result) as each completes."""
+    return completed({key: submit(task, workers) for key, task in tasks.items()})
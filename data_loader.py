@@ -0,0 +1,212 @@
+"""Process-wide loader for the diabetes encounters dataset.
+
+Streamlit re-executes main.py on every widget interaction, but imported
+modules stay in ``sys.modules``. Anything cached here is therefore shared by
+every rerun and every session served by the same server process.
+
+Data is read from the memory-mapped Arrow sidecar built by ``ingest.py``, so
+only the columns a view asks for are converted to pandas. Batches appended
+with ``ingest.append_batch`` are picked up without reopening the sidecar.
+"""
+import logging
+import os
+import threading
+import time
+
+from aggregation import encode
+from aggregates import SUMMARY_COLUMNS, build_summary, read_summary, summary_path, write_summary
+from bitmap_index import INDEXED_COLUMNS, BitmapIndex
+from instrumentation import register_counters
+from ingest import DATA_PATH, batches_dir, combine_versions, concat_tables, content_hash, open_sidecar, read_batches
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_cache = {}
+_stats = {'loads': 0, 'hits': 0, 'last_load_seconds': None}
+
+
+def _mtime(path):
+    """Returns the mtime of `path` in nanoseconds, or None if it does not exist."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _to_pandas(table, **kwargs):
+    """Converts `table` to pandas with categories in sorted order.
+
+    Appended batches can add categories after the existing ones; sorting keeps
+    charts and value counts in the same order as a fresh ingest.
+    """
+    data = table.to_pandas(**kwargs)
+    for column in data.columns:
+        series = data[column]
+        if hasattr(series, 'cat') and not series.cat.categories.is_monotonic_increasing:
+            data[column] = series.cat.reorder_categories(sorted(series.cat.categories))
+    return data
+
+
+def _get_entry(path):
+    """Returns the cache entry for `path`, re-opening the data only if it changed."""
+    stat = os.stat(path)
+    batches_mtime = _mtime(batches_dir(path))
+    entry = _cache.get(path)
+    unchanged = entry is not None and entry['mtime'] == stat.st_mtime_ns and entry['size'] == stat.st_size
+    if unchanged and entry['batches_mtime'] == batches_mtime:
+        return entry
+
+    if not unchanged:
+        # The file is new, touched or replaced: only reload if the content differs.
+        digest = content_hash(path)
+        if entry is None or entry['base_version'] != digest:
+            start = time.perf_counter()
+            table = open_sidecar(path, digest)
+            elapsed = time.perf_counter() - start
+
+            entry = {'table': table, 'frames': {}, 'base_version': digest, 'version': digest, 'batches': []}
+            _cache[path] = entry
+            _stats['loads'] += 1
+            _stats['last_load_seconds'] = elapsed
+            logger.info("Loaded %s (%d rows) in %.2fs", path, table.num_rows, elapsed)
+
+    # Pick up batches appended since the table was opened
+    entry['mtime'] = stat.st_mtime_ns
+    entry['size'] = stat.st_size
+    entry['batches_mtime'] = batches_mtime
+    loaded = [name for name, _ in entry['batches']]
+    new_batches = read_batches(path, entry['base_version'], skip=loaded)
+    if new_batches:
+        metadata = entry['table'].schema.metadata
+        tables = [table.replace_schema_metadata(metadata) for _, table, _ in new_batches]
+        entry['table'] = concat_tables([entry['table']] + tables)
+        entry['batches'] += [(name, version) for name, _, version in new_batches]
+        entry['version'] = combine_versions(entry['base_version'], [version for _, version in entry['batches']])
+        # Row-level structures are re-derived lazily; the summary is updated from deltas on append
+        entry['frames'] = {}
+        entry.pop('summary', None)
+        entry.pop('bitmap_index', None)
+        entry.pop('codes', None)
+        logger.info("Appended %d batch(es) to %s (%d rows)", len(new_batches), path, entry['table'].num_rows)
+    return entry
+
+
+def load_encounters(path=DATA_PATH, columns=None):
+    """Returns the encounters DataFrame, loaded once per process.
+
+    Pass `columns` to materialize only the columns a view needs. The cached
+    frame is shared between sessions and must not be modified in place. It is
+    reloaded when the file's mtime changes and its content hash no longer
+    matches, and re-materialized when batches are appended.
+    """
+    key = tuple(columns) if columns is not None else None
+    with _lock:
+        entry = _get_entry(path)
+        data = entry['frames'].get(key)
+        if data is not None:
+            _stats['hits'] += 1
+            return data
+
+        table = entry['table'] if key is None else entry['table'].select(list(key))
+        # split_blocks lets numeric columns reference the mapped buffers directly
+        data = _to_pandas(table, split_blocks=True)
+        entry['frames'][key] = data
+        return data
+
+
+def load_table(path=DATA_PATH):
+    """Returns the memory-mapped Arrow table of the current dataset version."""
+    with _lock:
+        return _get_entry(path)['table']
+
+
+def load_summary(path=DATA_PATH):
+    """Returns the precomputed aggregates for the current dataset version.
+
+    The summary is normally written by the ingest step; it is rebuilt here if
+    it is missing or belongs to an older version of the data.
+    """
+    with _lock:
+        entry = _get_entry(path)
+        summary = entry.get('summary')
+        if summary is not None:
+            _stats['hits'] += 1
+            return summary
+
+        summary = read_summary(summary_path(path), entry['version'])
+        if summary is None:
+            data = _to_pandas(entry['table'].select(SUMMARY_COLUMNS))
+            summary = build_summary(data, entry['version'])
+            write_summary(summary, summary_path(path))
+        entry['summary'] = summary
+        return summary
+
+
+def load_bitmap_index(path=DATA_PATH):
+    """Returns the bitmap index over the filter columns, built once per dataset version.
+
+    Row positions match the frames returned by load_encounters().
+    """
+    with _lock:
+        entry = _get_entry(path)
+        index = entry.get('bitmap_index')
+        if index is not None:
+            _stats['hits'] += 1
+            return index
+
+        start = time.perf_counter()
+        index = BitmapIndex(_to_pandas(entry['table'].select(INDEXED_COLUMNS)))
+        logger.info("Built bitmap index for %s in %.2fs", path, time.perf_counter() - start)
+        entry['bitmap_index'] = index
+        return index
+
+
+def load_codes(path=DATA_PATH, columns=()):
+    """Returns {column: (codes, labels)} for `columns`, encoded once per dataset version.
+
+    Row positions match the frames returned by load_encounters(); see
+    aggregation.encode().
+    """
+    with _lock:
+        entry = _get_entry(path)
+        cached = entry.setdefault('codes', {})
+        missing = [column for column in columns if column not in cached]
+        if missing:
+            data = _to_pandas(entry['table'].select(missing))
+            for column in missing:
+                cached[column] = encode(data[column])
+        else:
+            _stats['hits'] += 1
+        return {column: cached[column] for column in columns}
+
+
+def dataset_batches(path=DATA_PATH):
+    """Returns the version of the loaded sidecar and (name, version) for each batch appended to it."""
+    with _lock:
+        entry = _get_entry(path)
+        return entry['base_version'], list(entry['batches'])
+
+
+def dataset_version(path=DATA_PATH):
+    """Returns the content hash of the currently loaded dataset."""
+    with _lock:
+        return _get_entry(path)['version']
+
+
+def clear_cache():
+    """Drops every cached table, frame and index, e.g. to measure a cold load."""
+    with _lock:
+        _cache.clear()
+
+
+def loader_stats():
+    """Returns a copy of the loader counters (loads, hits, hit rate, last load time)."""
+    with _lock:
+        stats = dict(_stats)
+    lookups = stats['loads'] + stats['hits']
+    stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+    return stats
+
+
+register_counters('dataset_loader', loader_stats)
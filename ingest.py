@@ -0,0 +1,463 @@
+"""Converts the encounters CSV into a typed Arrow IPC sidecar.
+
+The aggregate summary used by the Metrics and Descriptive tabs is built in the
+same pass (see ``aggregates.py``).
+
+The sidecar is written uncompressed so that it can be memory-mapped: every
+server process that opens it shares the same OS page cache instead of holding
+its own parsed copy. Text columns are stored dictionary-encoded and come back
+as pandas categoricals.
+
+Extracts larger than memory are ingested in chunks (``--chunk-size``): peak
+memory is bounded by the chunk size rather than by the file size.
+
+New encounter batches are appended without re-ingesting the history: each
+batch is stored as its own Arrow segment next to the sidecar and the summary
+is updated from the batch's aggregates alone. Batches can be appended
+directly or dropped into a watched directory.
+
+``--partition`` also writes the hive-partitioned copy read by the
+``partitioned`` query backend (see ``partitions.py``), and ``--sqlite`` the
+database of the ``sqlite`` backend (see ``query_backend.py``), so that the
+dashboard does not build them on first use. With ``--append``, they add
+the new batches to the existing copies.
+
+Usage:
+    python ingest.py [path/to/encounters.csv] [--chunk-size ROWS] [--partition] [--sqlite]
+    python ingest.py [path/to/encounters.csv] --append BATCH.csv [BATCH.csv ...] [--partition] [--sqlite]
+    python ingest.py [path/to/encounters.csv] --watch DROP_DIR [--interval SECONDS]
+"""
+import argparse
+import contextlib
+import glob
+import hashlib
+import logging
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: writers still never share a temporary file, they may just rebuild twice
+    fcntl = None
+
+import aggregation
+from aggregates import DIAGNOSTIC_AGGREGATIONS, build_summary, merge_summaries, read_summary, summary_path, write_summary
+
+logger = logging.getLogger(__name__)
+
+DATA_PATH = './Diabestes_Hospital_Encounters.csv'
+
+# Schema metadata key recording which CSV content the sidecar was built from
+SOURCE_VERSION_KEY = b'source_version'
+
+# Schema metadata key recording the content hash of an appended batch
+BATCH_VERSION_KEY = b'batch_version'
+
+# CSV files larger than this are ingested in chunks when the sidecar is rebuilt
+STREAMING_THRESHOLD_BYTES = 512 * 1024 * 1024
+CHUNK_SIZE = 250_000
+
+
+def content_hash(path, chunk_size=1 << 20):
+    """Returns the SHA-256 hex digest of the file at `path`."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def sidecar_path(csv_path):
+    """Returns the Arrow sidecar path for `csv_path`."""
+    return os.path.splitext(csv_path)[0] + '.arrow'
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Holds an exclusive lock on ``<path>.lock``, shared by every process, while the block runs."""
+    if fcntl is None:
+        yield
+        return
+    with open(path + '.lock', 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _to_table(data, version):
+    """Converts a frame with categorical text columns to a tagged Arrow table."""
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[SOURCE_VERSION_KEY] = version.encode()
+    return table.replace_schema_metadata(metadata)
+
+
+def _index_type(num_categories, at_least):
+    """Returns the narrowest signed index type, no narrower than `at_least`, for `num_categories`."""
+    for index_type in (pa.int8(), pa.int16(), pa.int32()):
+        if index_type.bit_width >= at_least.bit_width and num_categories <= 2 ** (index_type.bit_width - 1) - 1:
+            return index_type
+    return pa.int64()
+
+
+def concat_tables(tables):
+    """Concatenates the sidecar and its batches, whose text columns may differ in dictionary index width."""
+    schema = tables[0].schema
+    for table in tables[1:]:
+        for position, field in enumerate(table.schema):
+            current = schema.field(position)
+            if pa.types.is_dictionary(field.type) and field.type.index_type.bit_width > current.type.index_type.bit_width:
+                schema = schema.set(position, current.with_type(field.type))
+    return pa.concat_tables([table.cast(schema) for table in tables])
+
+
+def _map_table(path):
+    """Returns the memory-mapped Arrow table stored at `path`."""
+    return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+
+def _write_tables(path, tables):
+    """Writes Arrow tables sharing one schema to `path` atomically."""
+    # Write to a temporary file of this process first so readers never map a partial file
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        writer = None
+        for table in tables:
+            if writer is None:
+                writer = pa.ipc.new_file(sink, table.schema)
+            writer.write_table(table)
+        if writer is not None:
+            writer.close()
+    os.replace(tmp_path, path)
+
+
+def build_sidecar(csv_path=DATA_PATH, version=None):
+    """Parses `csv_path` and writes its Arrow sidecar and summary.
+
+    Returns the sidecar path.
+    """
+    if version is None:
+        version = content_hash(csv_path)
+
+    data = pd.read_csv(csv_path)
+    # Dictionary-encode text columns; categories are sorted so that
+    # sort_index() on value counts keeps the same order as plain strings.
+    for column in data.columns:
+        if data[column].dtype == object:
+            data[column] = data[column].astype('category')
+
+    path = sidecar_path(csv_path)
+    _write_tables(path, [_to_table(data, version)])
+    write_summary(build_summary(data, version), summary_path(csv_path))
+    return path
+
+
+def _read_chunks(csv_path, chunk_size, phase, progress, **kwargs):
+    """Yields the CSV in chunks, reporting rows read and throughput to `progress`.
+
+    Extra keyword arguments are passed to pandas.read_csv.
+    """
+    total_bytes = os.path.getsize(csv_path)
+    start = time.perf_counter()
+    rows = 0
+    with open(csv_path, 'rb') as f:
+        for chunk in pd.read_csv(f, chunksize=chunk_size, **kwargs):
+            rows += len(chunk)
+            if progress is not None:
+                elapsed = time.perf_counter() - start
+                progress({
+                    'phase': phase,
+                    'rows': rows,
+                    'fraction': min(f.tell() / total_bytes, 1.0) if total_bytes else 1.0,
+                    'rows_per_second': rows / elapsed if elapsed else 0.0,
+                })
+            yield chunk
+
+
+def stream_sidecar(csv_path=DATA_PATH, version=None, chunk_size=CHUNK_SIZE, progress=None):
+    """Builds the sidecar and summary from `csv_path` one chunk at a time.
+
+    The first pass folds each chunk into the summary, including the totals
+    behind the static Diagnostic charts, and collects the categories and
+    dtypes of every column; the second pass writes the chunks
+    with those fixed categories, so all record batches share one dictionary.
+    A column read as numbers in some chunks and as text in others (e.g. a
+    '?' placeholder further down the file) is text: its categories are
+    collected again as text, in a pass over that column alone, and every
+    chunk is written with the text of its values, and the Diagnostic totals
+    are left out of the summary if they group by such a column (they are
+    then computed from the sidecar). Raises ValueError if a value would be
+    lost on the way.
+    `progress` is called with a dict (phase, rows, fraction, rows_per_second)
+    after each chunk. Returns the sidecar path.
+    """
+    if version is None:
+        version = content_hash(csv_path)
+
+    summary = None
+    dtypes = {}
+    categories = {}
+    # Columns read as numbers in at least one chunk
+    numeric = set()
+    for chunk in _read_chunks(csv_path, chunk_size, 'aggregating', progress):
+        part = build_summary(chunk, version)
+        summary = part if summary is None else merge_summaries(summary, part, version)
+        for column in chunk.columns:
+            previous = dtypes.get(column, chunk[column].dtype)
+            dtypes[column] = np.result_type(previous, chunk[column].dtype)
+            if chunk[column].dtype == object:
+                categories.setdefault(column, set()).update(chunk[column].dropna().unique())
+            else:
+                numeric.add(column)
+
+    text_columns = [column for column, dtype in dtypes.items() if dtype == object]
+    mixed = [column for column in text_columns if column in numeric]
+    if set(mixed) & set(aggregation.input_columns(DIAGNOSTIC_AGGREGATIONS)):
+        summary['diagnostic'] = None
+    if mixed:
+        for chunk in _read_chunks(csv_path, chunk_size, 'categories', progress, usecols=mixed, dtype=str):
+            for column in mixed:
+                categories[column].update(chunk[column].dropna().unique())
+
+    def tables():
+        for chunk in _read_chunks(csv_path, chunk_size, 'writing', progress,
+                                  dtype={column: str for column in text_columns}):
+            for column, dtype in dtypes.items():
+                if dtype == object:
+                    values = pd.Categorical(chunk[column], categories=sorted(categories.get(column, ())))
+                    lost = chunk[column].notna().sum() - values.notna().sum()
+                    if lost:
+                        raise ValueError(f"{lost} values of {column} are missing from its categories")
+                    chunk[column] = values
+                else:
+                    chunk[column] = chunk[column].astype(dtype)
+            yield _to_table(chunk, version)
+
+    path = sidecar_path(csv_path)
+    _write_tables(path, tables())
+    write_summary(summary, summary_path(csv_path))
+    return path
+
+
+def _current_sidecar(path, version):
+    """Returns the sidecar at `path` if it was built from `version` of the CSV, else None."""
+    if not os.path.exists(path):
+        return None
+    table = _map_table(path)
+    metadata = table.schema.metadata or {}
+    return table if metadata.get(SOURCE_VERSION_KEY) == version.encode() else None
+
+
+def open_sidecar(csv_path=DATA_PATH, version=None):
+    """Returns the memory-mapped Arrow table for `csv_path`.
+
+    The sidecar is (re)built when it is missing or was built from a different
+    version of the CSV.
+    """
+    if version is None:
+        version = content_hash(csv_path)
+    path = sidecar_path(csv_path)
+
+    table = _current_sidecar(path, version)
+    if table is not None:
+        return table
+
+    # Server processes starting together build the sidecar once
+    with file_lock(path):
+        table = _current_sidecar(path, version)
+        if table is None:
+            if os.path.getsize(csv_path) > STREAMING_THRESHOLD_BYTES:
+                stream_sidecar(csv_path, version, progress=log_progress)
+            else:
+                build_sidecar(csv_path, version)
+            table = _map_table(path)
+    return table
+
+
+def batches_dir(csv_path):
+    """Returns the directory holding the batches appended to `csv_path`."""
+    return os.path.splitext(csv_path)[0] + '.batches'
+
+
+def combine_versions(base_version, batch_versions):
+    """Returns the dataset version of a base sidecar plus appended batches."""
+    if not batch_versions:
+        return base_version
+    return hashlib.sha256('\n'.join([base_version] + list(batch_versions)).encode()).hexdigest()
+
+
+def read_batches(csv_path, base_version, skip=()):
+    """Returns (name, table, batch version) for each batch appended to `base_version`.
+
+    Batches are memory-mapped in append order; names in `skip` (already
+    loaded) are left out, as are batches appended to another base version.
+    """
+    batches = []
+    for path in sorted(glob.glob(os.path.join(batches_dir(csv_path), '*.arrow'))):
+        name = os.path.basename(path)
+        if name in skip:
+            continue
+        table = _map_table(path)
+        metadata = table.schema.metadata or {}
+        if metadata.get(SOURCE_VERSION_KEY) != base_version.encode():
+            continue
+        batches.append((name, table, metadata[BATCH_VERSION_KEY].decode()))
+    return batches
+
+
+def append_batch(batch_path, csv_path=DATA_PATH):
+    """Appends the encounters in `batch_path` to the stored dataset.
+
+    The batch is cast to the sidecar's schema and written as a new segment,
+    and the summary is updated by merging in the batch's own aggregates, so
+    the cost is proportional to the batch rather than the history. Returns
+    the new dataset version. Raises ValueError if the batch is already part
+    of the dataset.
+    """
+    # Use the existing sidecar as is: re-hashing the CSV would cost as much as the history
+    path = sidecar_path(csv_path)
+    base = _map_table(path) if os.path.exists(path) else open_sidecar(csv_path)
+    base_version = base.schema.metadata[SOURCE_VERSION_KEY].decode()
+    batch_version = content_hash(batch_path)
+    previous = read_batches(csv_path, base_version)
+    if batch_version == base_version or batch_version in [version for _, _, version in previous]:
+        raise ValueError(f"{batch_path} was already appended to {csv_path}")
+    batch = pd.read_csv(batch_path)
+
+    missing = set(base.schema.names) - set(batch.columns)
+    if missing:
+        raise ValueError(f"{batch_path} is missing columns: {', '.join(sorted(missing))}")
+
+    # Cast to the stored types; text columns keep their existing categories,
+    # with a wider dictionary index if the batch adds too many new ones
+    schema = base.schema
+    arrays = []
+    for position, field in enumerate(base.schema):
+        values = batch[field.name]
+        if pa.types.is_dictionary(field.type):
+            known = base.column(field.name).chunk(0).dictionary.to_pylist() if base.num_rows else []
+            categories = sorted(set(known) | set(values.dropna().unique()))
+            field_type = pa.dictionary(_index_type(len(categories), field.type.index_type), field.type.value_type)
+            schema = schema.set(position, field.with_type(field_type))
+            arrays.append(pa.array(pd.Categorical(values, categories=categories)).cast(field_type))
+        else:
+            arrays.append(pa.array(values, type=field.type))
+    metadata = dict(base.schema.metadata)
+    metadata[BATCH_VERSION_KEY] = batch_version.encode()
+    table = pa.Table.from_arrays(arrays, schema=schema.with_metadata(metadata))
+
+    previous_version = combine_versions(base_version, [version for _, _, version in previous])
+    version = combine_versions(base_version, [version for _, _, version in previous] + [batch_version])
+
+    summary = read_summary(summary_path(csv_path), previous_version)
+    if summary is None:
+        # No summary for the current state yet: build it once from the stored data
+        stored = concat_tables([base] + [batch_table for _, batch_table, _ in previous])
+        summary = build_summary(stored.to_pandas(), previous_version)
+    # From the cast batch, so its values have the stored types
+    summary = merge_summaries(summary, build_summary(table.to_pandas(), version), version)
+
+    os.makedirs(batches_dir(csv_path), exist_ok=True)
+    name = f"{time.time_ns()}-{batch_version[:12]}.arrow"
+    _write_tables(os.path.join(batches_dir(csv_path), name), [table])
+    write_summary(summary, summary_path(csv_path))
+    return version
+
+
+def watch_drop_directory(drop_dir, csv_path=DATA_PATH, interval=30.0, once=False):
+    """Appends every CSV dropped into `drop_dir`, moving it to `processed/` afterwards.
+
+    Feeds should write a batch under another name (e.g. ``batch.csv.part``)
+    and rename it to ``*.csv`` once complete. A batch is appended only once
+    its size and modification time are the same in two consecutive scans, so
+    a file still being written in place is left for a later scan. A batch
+    that cannot be appended is moved to `failed/` and the watcher carries on.
+    With `once`, returns after the scan that appends the batches found by the
+    first one.
+    """
+    processed_dir = os.path.join(drop_dir, 'processed')
+    failed_dir = os.path.join(drop_dir, 'failed')
+    os.makedirs(processed_dir, exist_ok=True)
+    os.makedirs(failed_dir, exist_ok=True)
+    # Batch path -> (size, mtime) at the previous scan
+    seen = {}
+    while True:
+        pending = {}
+        for batch_path in sorted(glob.glob(os.path.join(drop_dir, '*.csv'))):
+            stat = os.stat(batch_path)
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if seen.get(batch_path) != signature:
+                # New or still growing: look again at the next scan
+                pending[batch_path] = signature
+                continue
+            name = os.path.basename(batch_path)
+            try:
+                version = append_batch(batch_path, csv_path)
+            except Exception as error:
+                shutil.move(batch_path, os.path.join(failed_dir, name))
+                print(f"Could not append {batch_path}, moved it to {failed_dir}: {error}")
+                continue
+            shutil.move(batch_path, os.path.join(processed_dir, name))
+            print(f"Appended {batch_path} (dataset version {version[:12]})")
+        if once and not (pending and not seen):
+            return
+        seen = pending
+        time.sleep(interval)
+
+
+def log_progress(progress):
+    """Logs the progress of an ingest run by the server, which has no console to print it to."""
+    logger.info("Ingest %s: %d rows (%.1f%%, %.0f rows/s)", progress['phase'], progress['rows'],
+                progress['fraction'] * 100, progress['rows_per_second'])
+
+
+def print_progress(progress):
+    print(f"{progress['phase']:>11}: {progress['rows']:>12,} rows  {progress['fraction']:6.1%}  "
+          f"{progress['rows_per_second']:,.0f} rows/s")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the Arrow sidecar and summary for an encounters CSV.')
+    parser.add_argument('csv_path', nargs='?', default=DATA_PATH)
+    parser.add_argument('--chunk-size', type=int, default=None,
+                        help='ingest in chunks of this many rows to bound memory use')
+    parser.add_argument('--append', nargs='+', metavar='BATCH', help='append new encounter batches')
+    parser.add_argument('--watch', metavar='DROP_DIR', help='append batches dropped into this directory')
+    parser.add_argument('--interval', type=float, default=30.0, help='seconds between drop directory scans')
+    parser.add_argument('--partition', action='store_true',
+                        help='also write the partitioned dataset of the partitioned query backend')
+    parser.add_argument('--sqlite', action='store_true', help='also write the database of the sqlite query backend')
+    args = parser.parse_args()
+
+    if args.append:
+        for batch_path in args.append:
+            print(f"Appended {batch_path} (dataset version {append_batch(batch_path, args.csv_path)[:12]})")
+        if args.partition:
+            import partitions
+            print(f"Updated {partitions.build_partitions(args.csv_path)}")
+        if args.sqlite:
+            import query_backend
+            print(f"Updated {query_backend.build_database(args.csv_path)}")
+        raise SystemExit
+    if args.watch:
+        watch_drop_directory(args.watch, args.csv_path, args.interval)
+
+    if args.chunk_size:
+        path = stream_sidecar(args.csv_path, chunk_size=args.chunk_size, progress=print_progress)
+    else:
+        path = build_sidecar(args.csv_path)
+    print(f"Wrote {path}")
+    if args.partition:
+        import partitions
+        print(f"Wrote {partitions.build_partitions(args.csv_path)}")
+    if args.sqlite:
+        import query_backend
+        print(f"Wrote {query_backend.build_database(args.csv_path)}")
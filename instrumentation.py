@@ -0,0 +1,260 @@
+"""Timing and allocation spans for the sections of a dashboard rerun.
+
+    with span('load'):
+        ...
+
+Spans nest, and a nested span is recorded under its full path, e.g.
+``Diagnostic analysis/readmitted_comorbidities``. Each span records its wall
+time and, when allocation tracing is enabled, the memory it allocated (net)
+and its peak traced memory above the level it started at.
+
+A rerun is bracketed with start_run() and finish_run(). finish_run() keeps
+the spans of the run as the latest breakdown and exports the process totals
+to the configured metrics file, as Prometheus text (for a node exporter's
+textfile collector) or as one JSON line per rerun. A fragment rerun skips
+the script around the fragment, so fragments are wrapped in fragment_run(),
+which brackets their own reruns the same way.
+
+Modules with counters of their own (cache hits and misses, dataset loads)
+register them with register_counters(); they are exported with the spans
+and shown in the admin overlay.
+
+milestone(name) records the time from the start of the rerun to a point in
+the script, e.g. ``Diagnostic analysis/first_content`` once the light
+content of a view is drawn and ``Diagnostic analysis/complete`` once its
+last chart is.
+
+Spans are kept per thread, since Streamlit runs each session's script on its
+own thread; the totals are shared by the whole process. Traced memory is
+process-wide, so reruns of concurrent sessions inflate each other's peaks.
+"""
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import namedtuple
+from contextlib import ExitStack, contextmanager
+
+METRICS_FORMATS = ('prometheus', 'jsonl')
+
+Span = namedtuple('Span', ['section', 'seconds', 'allocated_bytes', 'peak_bytes'])
+
+_config = {'metrics_path': None, 'metrics_format': 'prometheus', 'trace_allocations': False}
+_local = threading.local()
+_lock = threading.Lock()
+# Per section: [calls, total seconds, last Span]
+_totals = {}
+# Source name -> function returning its counters
+_counter_sources = {}
+
+
+def configure(metrics_path=None, metrics_format='prometheus', trace_allocations=False):
+    """Sets where metrics are exported and whether allocations are traced."""
+    if metrics_format not in METRICS_FORMATS:
+        raise ValueError(f"Unknown metrics format {metrics_format!r}; expected one of {', '.join(METRICS_FORMATS)}")
+    _config.update(metrics_path=metrics_path, metrics_format=metrics_format, trace_allocations=trace_allocations)
+    if trace_allocations and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def _stack():
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+
+class _Frame:
+    """A span that is still open on this thread."""
+
+    def __init__(self, name):
+        self.name = name
+        self.start_memory = self.peak = 0
+
+
+@contextmanager
+def span(name):
+    """Times the enclosed section of a rerun."""
+    stack = _stack()
+    frame = _Frame(name)
+    section = '/'.join([open_frame.name for open_frame in stack] + [name])
+    traced = tracemalloc.is_tracing()
+    if traced:
+        current, peak = tracemalloc.get_traced_memory()
+        # The enclosing span keeps its own peak; start a fresh one for this span
+        if stack:
+            stack[-1].peak = max(stack[-1].peak, peak)
+        tracemalloc.reset_peak()
+        frame.start_memory = frame.peak = current
+    stack.append(frame)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        stack.pop()
+        allocated = peak = None
+        if traced:
+            current, traced_peak = tracemalloc.get_traced_memory()
+            frame.peak = max(frame.peak, traced_peak)
+            allocated = current - frame.start_memory
+            peak = frame.peak - frame.start_memory
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, frame.peak)
+        _record(Span(section, seconds, allocated, peak))
+
+
+def _record(recorded):
+    with _lock:
+        totals = _totals.setdefault(recorded.section, [0, 0.0, None])
+        totals[0] += 1
+        totals[1] += recorded.seconds
+        totals[2] = recorded
+    run = getattr(_local, 'run', None)
+    if run is not None:
+        run.append(recorded)
+
+
+def milestone(name):
+    """Records the time elapsed since start_run() as the section `name`."""
+    start = getattr(_local, 'run_start', None)
+    if start is None:
+        return
+    section = '/'.join([frame.name for frame in _stack()] + [name])
+    _record(Span(section, time.perf_counter() - start, None, None))
+
+
+def carry(function):
+    """Wraps `function` so that spans it opens on another thread belong to this thread's rerun.
+
+    Used for work submitted to a thread pool: the spans are recorded under the
+    span that was open when `function` was wrapped.
+    """
+    run = getattr(_local, 'run', None)
+    names = [frame.name for frame in _stack()]
+
+    def carried(*args, **kwargs):
+        _local.run = run
+        _local.stack = [_Frame(name) for name in names]
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _local.run = None
+            _local.stack = []
+    return carried
+
+
+def start_run():
+    """Starts collecting the spans of a rerun on this thread."""
+    _local.run = []
+    _local.stack = []
+    _local.run_start = time.perf_counter()
+
+
+def finish_run():
+    """Ends the rerun on this thread, exports the metrics and returns its spans."""
+    run = getattr(_local, 'run', None) or []
+    _local.run = None
+    _local.latest = run
+    if _config['metrics_path']:
+        export(run)
+    return run
+
+
+@contextmanager
+def fragment_run(*sections):
+    """Times a Streamlit fragment, as a rerun of its own when it reruns alone.
+
+    During a full rerun the fragment is part of that run. When only the
+    fragment reruns, no run is in progress: one is started and finished
+    around it, with its spans nested under `sections` (e.g. the view name)
+    so that they are recorded under the same names as in a full rerun.
+    Yields whether the fragment ran as a rerun of its own.
+    """
+    if getattr(_local, 'run', None) is not None:
+        yield False
+        return
+    start_run()
+    try:
+        with ExitStack() as stack:
+            for section in sections:
+                stack.enter_context(span(section))
+            yield True
+    finally:
+        finish_run()
+
+
+def latest_run():
+    """Returns the spans of the last finished rerun on this thread."""
+    return getattr(_local, 'latest', [])
+
+
+def totals():
+    """Returns {section: (calls, total seconds, last Span)} for the whole process."""
+    with _lock:
+        return {section: tuple(values) for section, values in _totals.items()}
+
+
+def register_counters(source, stats):
+    """Exports the counters returned by `stats()`, a dict of numbers, under the name `source`."""
+    with _lock:
+        _counter_sources[source] = stats
+
+
+def counters():
+    """Returns {source: {counter: value}} for every registered source, leaving out unset counters."""
+    with _lock:
+        sources = sorted(_counter_sources.items())
+    return {source: {name: value for name, value in stats().items() if value is not None}
+            for source, stats in sources}
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_text():
+    """Returns the process totals in the Prometheus text exposition format."""
+    metrics = [
+        ('dashboard_section_calls_total', 'counter', 'Times each dashboard section ran.',
+         lambda calls, seconds, last: calls),
+        ('dashboard_section_seconds_total', 'counter', 'Wall time spent in each dashboard section.',
+         lambda calls, seconds, last: seconds),
+        ('dashboard_section_last_seconds', 'gauge', 'Wall time of the last run of each section.',
+         lambda calls, seconds, last: last.seconds),
+        ('dashboard_section_last_allocated_bytes', 'gauge', 'Net traced allocations of the last run of each section.',
+         lambda calls, seconds, last: last.allocated_bytes),
+        ('dashboard_section_last_peak_bytes', 'gauge', 'Peak traced memory of the last run of each section.',
+         lambda calls, seconds, last: last.peak_bytes),
+    ]
+    sections = sorted(totals().items())
+    lines = []
+    for name, kind, description, value in metrics:
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+        for section, values in sections:
+            sample = value(*values)
+            if sample is not None:
+                lines.append(f'{name}{{section="{_label(section)}"}} {sample}')
+    lines.append('# HELP dashboard_counter Counters of the caches and loaders, by source.')
+    lines.append('# TYPE dashboard_counter gauge')
+    for source, values in counters().items():
+        for name, sample in values.items():
+            lines.append(f'dashboard_counter{{source="{_label(source)}",counter="{_label(name)}"}} {sample}')
+    return '\n'.join(lines) + '\n'
+
+
+def export(run):
+    """Writes the metrics to the configured file."""
+    path = _config['metrics_path']
+    if _config['metrics_format'] == 'jsonl':
+        line = json.dumps({'timestamp': time.time(), 'spans': [recorded._asdict() for recorded in run],
+                           'counters': counters()})
+        with _lock, open(path, 'a') as f:
+            f.write(line + '\n')
+    else:
+        # Replace the file atomically so that a scraper never reads half of it
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(prometheus_text())
+        os.replace(tmp_path, path)
@@ -2,10 +2,22 @@ import streamlit as st
 import matplotlib.pyplot as plt
 import pandas as pd
 import seaborn as sns
-import base64
 import plotly.express as px
 import plotly.graph_objects as go
 import altair as alt
+import functools
+import threading
+import aggregates
+import analytics
+import assets
+import chart_executor
+import instrumentation
+import progressive
+import query_backend
+import risk_model
+from caching import cached_figure, cached_image, cached_result
+from data_loader import dataset_version, load_summary
+from instrumentation import span
 
 
 def check_password():
@@ -45,6 +57,39 @@ if check_password():
 		layout="wide",
 	 
 	)
+	# Per-section timing of this rerun (see instrumentation.py); exported if metrics_path is set
+	instrumentation.configure(st.secrets.get('metrics_path'), st.secrets.get('metrics_format', 'prometheus'),
+							  st.secrets.get('trace_allocations', False))
+	instrumentation.start_run()
+	# Heavy charts are drawn into placeholders once the light content of a view is on the page
+	chart_workers = st.secrets.get('chart_workers', chart_executor.DEFAULT_WORKERS)
+	progressive_rendering = st.secrets.get('progressive_rendering', True)
+	metrics_overlay = st.secrets.get('metrics_overlay', False)
+
+	def show_timings(spans):
+		"""Table of the spans of a rerun, for the admin overlay."""
+		breakdown = pd.DataFrame(spans, columns=instrumentation.Span._fields)
+		breakdown['ms'] = breakdown['seconds'] * 1000
+		breakdown['allocated MB'] = breakdown['allocated_bytes'] / 1024 / 1024
+		breakdown['peak MB'] = breakdown['peak_bytes'] / 1024 / 1024
+		st.dataframe(breakdown[['section', 'ms', 'allocated MB', 'peak MB']].round(2),
+					 hide_index=True, use_container_width=True)
+
+	def timed_fragment(panel):
+		"""Times the reruns of the fragment `panel` like full reruns of the selected view.
+
+		`panel` is called with whether the fragment reruns alone (see progressive.Charts.fill_fragment).
+		"""
+		@functools.wraps(panel)
+		def timed():
+			with instrumentation.fragment_run(selected_view) as own_run:
+				panel(own_run)
+			# A fragment cannot draw into the sidebar, so its timings go under the panel
+			if own_run and metrics_overlay:
+				with st.expander("Rerun timings of this panel"):
+					show_timings(instrumentation.latest_run())
+		return timed
+
 	# Set color palette for visualizations
 	sns.set_palette("pastel")
 
@@ -85,13 +130,9 @@ if check_password():
 		""",
 		unsafe_allow_html=True
 	)
-	# Load your data
-	data = pd.read_csv('./Diabestes_Hospital_Encounters.csv')
-	# Display the top 5 rows using st.dataframe()
+	# Each view is a function so that only the selected one runs on a rerun
 
-	tab1, tab2, tab3,tab4,tab5 = st.tabs(["Story", "Metrics & Demographics", "Descriptive Analysis","Diagnostic analysis","Overview & definitions"])
-
-	with tab1:
+	def render_story():
 
 
 		# Create the container with two columns
@@ -110,8 +151,7 @@ if check_password():
 		with col2:
 			
 			st.markdown("<div class='right-column'>", unsafe_allow_html=True)
-			image_path = "./readmission.jpg"  # Replace with the actual path to your image
-			st.image(image_path, use_column_width=True)
+			assets.image('readmission.jpg', full_width=True)
 			st.markdown("</div>", unsafe_allow_html=True)
 
 		# Footer
@@ -124,8 +164,14 @@ if check_password():
 
 
 
-	with tab2:
-		# Add your code for tab2 here
+	def render_metrics():
+		with span('load'):
+			# Precomputed aggregates (built at ingest time, shared across reruns and sessions)
+			summary = load_summary()
+			# Demographics charts are rendered once per dataset version
+			version = dataset_version()
+		# pyplot is not thread-safe: the demographics charts are rendered on the script thread
+		charts = progressive.Charts(1, progressive_rendering)
 		
 		# Card section
 		with st.container():
@@ -159,14 +205,11 @@ if check_password():
 			# Metric 1: Total hospital Encounters
 			with col1:
 				st.markdown("<p class='metric-label'>Total Encounters</p>", unsafe_allow_html=True)
-				st.markdown(f"<p class='metric'>{len(data)}</p>", unsafe_allow_html=True)
+				st.markdown(f"<p class='metric'>{summary['total']}</p>", unsafe_allow_html=True)
 				# Metric 2: Readmitted = Yes
 			with col2:
-				readmitted_yes_count = len(data[data['readmitted'] == 'Yes'])
-				total_cases = len(data)
-
 				# Calculate the percentage of readmitted cases
-				readmitted_percentage = (readmitted_yes_count / total_cases) * 100
+				readmitted_percentage = aggregates.readmitted_percentage(summary)
 				readmitted_percentage_formatted = "{:.2f}%".format(readmitted_percentage)
 
 				st.markdown("<p class='metric-label'>Readmitted</p>", unsafe_allow_html=True)
@@ -174,19 +217,19 @@ if check_password():
 			
 			# Metric 3: Average time in hospital
 			with col3:
-				average_time_in_hospital = int(data['time_in_hospital'].mean())
+				average_time_in_hospital = int(aggregates.mean(summary, 'time_in_hospital'))
 				st.markdown("<p class='metric-label'>Avg days in hospital</p>", unsafe_allow_html=True)
 				st.markdown(f"<p class='metric-value'>{average_time_in_hospital}</p>", unsafe_allow_html=True)
 			
 			# Metric 4: Average lab procedures
 			with col4:
-				average_lab_procedures = int(data['num_lab_procedures'].mean())
+				average_lab_procedures = int(aggregates.mean(summary, 'num_lab_procedures'))
 				st.markdown("<p class='metric-label'>Avg lab procedures/stay</p>", unsafe_allow_html=True)
 				st.markdown(f"<p class='metric-value'>{average_lab_procedures}</p>", unsafe_allow_html=True)
 			
 			# Metric 5: Average medications
 			with col5:
-				average_medications = int(data['num_medications'].mean())
+				average_medications = int(aggregates.mean(summary, 'num_medications'))
 				st.markdown("<p class='metric-label'>Avg medications/stay</p>", unsafe_allow_html=True)
 				st.markdown(f"<p class='metric-value'>{average_medications}</p>", unsafe_allow_html=True)
 
@@ -207,65 +250,72 @@ if check_password():
 
 			# Chart 1: Gender Distribution
 			with col1:
-				gender_counts = data['gender'].value_counts()
-
-				# Create pie chart
-				fig, ax = plt.subplots(figsize=(8, 6))
-				wedges, labels, autopct = ax.pie(gender_counts, labels=gender_counts.index, autopct='%1.1f%%', startangle=90, colors=['#2B65EC', '#5CB3FF'])
-				# Set plot title and labels
-				ax.set_title("Gender\n",fontfamily="Arial", fontsize=18,fontweight='bold')
-				# Modify the size of labels
-				
-				for label in labels:
-					label.set_size(8)
+				def gender_chart():
+					gender_counts = aggregates.value_counts(summary, 'gender')
+
+					# Create pie chart
+					fig, ax = plt.subplots(figsize=(8, 6))
+					wedges, labels, autopct = ax.pie(gender_counts, labels=gender_counts.index, autopct='%1.1f%%', startangle=90, colors=['#2B65EC', '#5CB3FF'])
+					# Set plot title and labels
+					ax.set_title("Gender\n",fontfamily="Arial", fontsize=18,fontweight='bold')
+					# Modify the size of labels
+
+					for label in labels:
+						label.set_size(8)
+					return fig
+
 				# Show the plot
-				st.pyplot(fig)
+				charts.add('gender', lambda: cached_image('gender', version, gender_chart), 'image', use_column_width=True)
 
 			# Chart 2: Age Distribution
 			with col2:
-				# Create countplot
-				# Sort the age values in descending order
-				sorted_age = data['age'].value_counts().sort_values(ascending=False).index
-				fig, ax = plt.subplots(figsize=(8, 6))
-				sns.countplot(x="age", data=data,order=sorted_age, palette="Set1")
-
-				# Set plot title and labels
-				ax.set_title("Age\n\n\n",fontfamily="Arial",fontsize=24,fontweight='bold')
-				ax.set_xlabel("")
-				ax.set_ylabel("")
-				# Remove the border lines
-				ax.spines['top'].set_visible(False)
-				ax.spines['right'].set_visible(False)
-				ax.spines['bottom'].set_visible(False)
-				ax.spines['left'].set_visible(False)
-				
-				
+				# Create count bar chart from the precomputed age counts
+				def age_chart():
+					# Sort the age values in descending order
+					age_counts = aggregates.value_counts(summary, 'age')
+					sorted_age = age_counts.sort_values(ascending=False).index
+					fig, ax = plt.subplots(figsize=(8, 6))
+					sns.barplot(x=age_counts.index, y=age_counts.values, order=sorted_age, palette="Set1", ax=ax)
+
+					# Set plot title and labels
+					ax.set_title("Age\n\n\n",fontfamily="Arial",fontsize=24,fontweight='bold')
+					ax.set_xlabel("")
+					ax.set_ylabel("")
+					# Remove the border lines
+					ax.spines['top'].set_visible(False)
+					ax.spines['right'].set_visible(False)
+					ax.spines['bottom'].set_visible(False)
+					ax.spines['left'].set_visible(False)
+					return fig
+
 				# Show the plot
-				st.pyplot(fig)
+				charts.add('age', lambda: cached_image('age', version, age_chart), 'image', use_column_width=True)
 
 			# Chart 3: Race Distribution
 			with col3:
-				# Get the value counts for the race column
-				race_counts = data['race'].value_counts()
-
-				# Create a bar chart
-				fig, ax = plt.subplots(figsize=(8, 6))
-				sns.barplot(x=race_counts.index, y=race_counts.values, color="#1E90FF",ax=ax)
-
-				# Set plot title and labels
-				ax.set_title('Race\n\n\n',fontfamily="Arial", fontsize=24,fontweight='bold')
-				ax.set_xlabel('')
-				ax.set_ylabel('')
-				# Remove the border lines
-				ax.spines['top'].set_visible(False)
-				ax.spines['right'].set_visible(False)
-				ax.spines['bottom'].set_visible(False)
-				ax.spines['left'].set_visible(False)
-				# Rotate the x-axis labels for better readability
-				ax.set_xticklabels(ax.get_xticklabels(), rotation=45)
+				def race_chart():
+					# Get the value counts for the race column
+					race_counts = aggregates.value_counts(summary, 'race')
+
+					# Create a bar chart
+					fig, ax = plt.subplots(figsize=(8, 6))
+					sns.barplot(x=race_counts.index, y=race_counts.values, color="#1E90FF",ax=ax)
+
+					# Set plot title and labels
+					ax.set_title('Race\n\n\n',fontfamily="Arial", fontsize=24,fontweight='bold')
+					ax.set_xlabel('')
+					ax.set_ylabel('')
+					# Remove the border lines
+					ax.spines['top'].set_visible(False)
+					ax.spines['right'].set_visible(False)
+					ax.spines['bottom'].set_visible(False)
+					ax.spines['left'].set_visible(False)
+					# Rotate the x-axis labels for better readability
+					ax.set_xticklabels(ax.get_xticklabels(), rotation=45)
+					return fig
 
 				# Show the plot
-				st.pyplot(fig)
+				charts.add('race', lambda: cached_image('race', version, race_chart), 'image', use_column_width=True)
 				
 		
 
@@ -276,9 +326,19 @@ if check_password():
 			st.markdown("<hr style='border: 1px solid black'>", unsafe_allow_html=True)
 			st.text("2023 Healthcare Analytics Dashboard-Samer Bou Hamdan. All rights reserved.")
 
+		# Draw the demographics charts once the KPI cards are on the page
+		charts.fill()
+
 
 
-	with tab3:
+	def render_descriptive():
+		with span('load'):
+			summary = load_summary()
+			# Row-level queries go through the configured backend (pandas by default)
+			backend = query_backend.get_backend(st.secrets.get('query_backend', 'pandas'), analytics.DESCRIPTIVE_COLUMNS)
+			# Static charts are cached per dataset version
+			version = dataset_version()
+		charts = progressive.Charts(chart_workers, progressive_rendering)
 		st.header('*Hospital Encounters*')
 		
 
@@ -288,49 +348,54 @@ if check_password():
 		with col1:
 			# Calculate the average time in the hospital by age
 			st.write('')
-			average_time = data.groupby('age')['time_in_hospital'].mean().reset_index()
-
-			# Create the line chart using Plotly Express
-			fig = px.line(average_time, x='age', y='time_in_hospital')
-
-			# Set the layout properties
-			fig.update_layout(
-				title='Average Time in Hospital by Age',
-				xaxis=dict(title=''),
-				yaxis=dict(title=''),
-				showlegend=False,
-				width=450, height=400
-				)
+			def average_time_chart():
+				average_time = analytics.average_time_by_age(summary)
+
+				# Create the line chart using Plotly Express
+				fig = px.line(average_time, x='age', y='time_in_hospital')
+
+				# Set the layout properties
+				fig.update_layout(
+					title='Average Time in Hospital by Age',
+					xaxis=dict(title=''),
+					yaxis=dict(title=''),
+					showlegend=False,
+					width=450, height=400
+					)
+				return fig
 
 			# Display the line chart in Streamlit
-			 
-			st.plotly_chart(fig)
+			charts.add('average_time_by_age', lambda: cached_figure('average_time_by_age', version, average_time_chart))
 
 			# Histogram: Time in Hospital
 		with col2:
 				
-			# Create the histogram using Plotly
-			fig = go.Figure(data=[go.Histogram(
-			x=data['time_in_hospital'],
-			nbinsx=14,
-			marker_color='#73C2FB'
-				)])
-
-			# Set the layout properties
-			fig.update_layout(
-				title='Histogram (days stayed in hospital)',
-				xaxis=dict(title=''),
-				yaxis=dict(title=''),
-				showlegend=False,
-				bargap=0.1,
-				plot_bgcolor='white'
-				,width=450, height=420
-				
-					
-				)
+			def time_in_hospital_histogram():
+				# Stays are whole days: one bar per day, binned on the server so that
+				# only the counts are sent to the browser
+				stay_counts = analytics.length_of_stay(backend)
+				fig = go.Figure(data=[go.Bar(
+				x=stay_counts['time_in_hospital'],
+				y=stay_counts['count'],
+				marker_color='#73C2FB'
+					)])
+
+				# Set the layout properties
+				fig.update_layout(
+					title='Histogram (days stayed in hospital)',
+					xaxis=dict(title=''),
+					yaxis=dict(title=''),
+					showlegend=False,
+					bargap=0.1,
+					plot_bgcolor='white'
+					,width=450, height=420
+
+
+					)
+				return fig
 
 			# Display the histogram in Streamlit
-			st.plotly_chart(fig)			
+			charts.add('time_in_hospital_histogram', lambda: cached_figure('time_in_hospital_histogram', version, time_in_hospital_histogram))			
 
 		# Create the insight_container container
 		encounter_container = st.container()
@@ -343,53 +408,48 @@ if check_password():
 			# admission types
 			with col1:
 			
-				admissiontype_counts = data['Admissiontype'].value_counts()
-
-				# Create a DataFrame with the admission type and count values
-				admissiontype_data = pd.DataFrame({'Admission Type': admissiontype_counts.index, 'Count': admissiontype_counts.values})
+				def admission_types_chart():
+					# Admission types sorted by count, least frequent first
+					admissiontype_data = analytics.admission_types(summary)
+
+					# Create the horizontal bar chart using plotly.graph_objects
+					fig = go.Figure(go.Bar(
+						x=admissiontype_data['Count'],
+						y=admissiontype_data['Admission Type'],
+						orientation='h',
+					))
 
-				# Sort the DataFrame by count values in descending order
-				admissiontype_data = admissiontype_data.sort_values('Count', ascending=True)
+					fig.update_layout(
+					title='Admission types',
+					#xaxis_title='Count',
+					#yaxis_title='Admission Type',
+					width=450, height=400,
 
-				# Create the horizontal bar chart using plotly.graph_objects
-				fig = go.Figure(go.Bar(
-					x=admissiontype_data['Count'],
-					y=admissiontype_data['Admission Type'],
-					orientation='h',
-				))
+				)
+					return fig
 
-				fig.update_layout(
-				title='Admission types',
-				#xaxis_title='Count',
-				#yaxis_title='Admission Type',
-				width=450, height=400,
-				
-			)
-			
 				# Render the plotly figure using st.plotly_chart
-				st.plotly_chart(fig)	
+				charts.add('admission_types', lambda: cached_figure('admission_types', version, admission_types_chart))	
 			# Discharge category
 			with col2:
 				st.write('')
 				# Create a donut chart using Plotly
-				def plot_donut_chart(data):
+				def plot_donut_chart(summary):
 					# Count the occurrences of each discharge type
-					discharge_counts = data["Discharge_type"].value_counts()
+					discharge_counts = analytics.discharge_types(summary)
 
 					# Create the donut chart using Plotly
-					fig = px.pie(discharge_counts, values=discharge_counts.values, names=discharge_counts.index, hole=0.5)
+					fig = px.pie(discharge_counts, values=discharge_counts['Count'].values, names='Discharge_type', hole=0.5)
 
 					# Update layout properties
 					fig.update_traces(textposition='inside', textinfo='percent+label')
 					fig.update_layout(title='Discharge types'
 								,width=500, height=400
 									)
+					return fig
 
-					# Display the chart using Streamlit
-					st.plotly_chart(fig)
-
-				# Call the function to plot the donut chart
-				plot_donut_chart(data)
+				# Display the cached donut chart using Streamlit
+				charts.add('discharge_types', lambda: cached_figure('discharge_types', version, lambda: plot_donut_chart(summary)))
 		# Create the drug_container container
 		# Add a line between sections
 		st.markdown("---")
@@ -405,85 +465,105 @@ if check_password():
 			col1, col2 = st.columns([2, 1]) 
 			with col1: 
 						
-				# Filter the data where Diabetes_Med is 'Yes'
-				filtered_data = data[data['Diabetes_Med'] == 'Yes']
+				def top_medications_chart():
+					# Top 18 medications where Diabetes_Med is 'Yes'
+					top_18_medication_counts = analytics.top_medications(summary, 18)
 
-				# Calculate the count of each medication
-				medication_counts = filtered_data['Medication'].value_counts().reset_index()
-				medication_counts.columns = ['Medication', 'Count']
-				medication_counts = medication_counts.sort_values('Count', ascending=False)
 
-				# Select the top 18 medications
-				top_18_medication_counts = medication_counts.head(18)
 
-				
+					# Create the Plotly bar chart
+					fig = go.Figure(data=[go.Bar(
+						x=top_18_medication_counts['Medication'],
+						y=top_18_medication_counts['Count'],
+					)])
 
-				# Create the Plotly bar chart
-				fig = go.Figure(data=[go.Bar(
-					x=top_18_medication_counts['Medication'],
-					y=top_18_medication_counts['Count'],
-				)])
+					# Customize the layout
+					fig.update_layout(
+						title='Top 18 Medications',
 
-				# Customize the layout
-				fig.update_layout(
-					title='Top 18 Medications',
-					
-					xaxis=dict(
-						title='',
-						tickangle=45,
-						tickfont=dict(size=14),
-					),
-					yaxis=dict(title=''),
-					width=800  # Set the width of the chart based on the selected option
-				)
+						xaxis=dict(
+							title='',
+							tickangle=45,
+							tickfont=dict(size=14),
+						),
+						yaxis=dict(title=''),
+						width=800  # Set the width of the chart based on the selected option
+					)
+					return fig
 
 				# Render the chart using Plotly in Streamlit
-				st.plotly_chart(fig, use_container_width=True)
+				charts.add('top_medications', lambda: cached_figure('top_medications', version, top_medications_chart),
+						   use_container_width=True)
 
 				
 			with col2:
-				st.image('./MedicationCartoon.jpg')
+				assets.image('MedicationCartoon.jpg')
 		# Add a line between sections
 		st.markdown("---")
 		st.header('*Health Condition Diagnosis*')
 	  
 
-		# treemap for primary diagnosis
-		# Calculate the count of each diagnosis value in the filtered data
-		diagnosis_counts = data['Diagnosis1'].value_counts()
-
-		# Create a DataFrame with the diagnosis and count values
-		diagnosis_data = pd.DataFrame({'Diagnosis': diagnosis_counts.index, 'Count': diagnosis_counts.values})
-
-		# Calculate the percentage of the total count
-		diagnosis_data['Percentage'] = diagnosis_data['Count'] / diagnosis_data['Count'].sum() * 100
-
-		# Sort the DataFrame by count in descending order
-		diagnosis_data = diagnosis_data.sort_values('Count', ascending=False)
-
-		# Create the treemap using Plotly
-		fig = go.Figure(go.Treemap(
-			labels=diagnosis_data['Diagnosis'],
-			parents=[''] * len(diagnosis_data),
-			values=diagnosis_data['Count'],
-			texttemplate="%{label}<br>%{value} (%{percentParent})",
-			textfont=dict(size=16),
-			branchvalues='total',
-			hovertemplate='<b>%{label}</b><br>Count: %{value}<br>Percentage: %{percentParent}<extra></extra>',
-		))
-
-		# Set the title
-		fig.update_layout(title='Primary Diagnosis')
+		def primary_diagnosis_treemap():
+			# treemap for primary diagnosis
+			# Count and percentage of each diagnosis, most frequent first
+			diagnosis_data = analytics.primary_diagnosis(summary)
+
+			# Create the treemap using Plotly
+			fig = go.Figure(go.Treemap(
+				labels=diagnosis_data['Diagnosis'],
+				parents=[''] * len(diagnosis_data),
+				values=diagnosis_data['Count'],
+				texttemplate="%{label}<br>%{value} (%{percentParent})",
+				textfont=dict(size=16),
+				branchvalues='total',
+				hovertemplate='<b>%{label}</b><br>Count: %{value}<br>Percentage: %{percentParent}<extra></extra>',
+			))
+
+			# Set the title
+			fig.update_layout(title='Primary Diagnosis')
+			return fig
 
 		# Display the treemap in Streamlit
-		st.plotly_chart(fig, use_container_width=True)
+		charts.add('primary_diagnosis', lambda: cached_figure('primary_diagnosis', version, primary_diagnosis_treemap),
+				   use_container_width=True)
 		
 		
 		with st.container():
 			st.markdown("<hr style='border: 1px solid black'>", unsafe_allow_html=True)
 			st.text("2023 Healthcare Analytics Dashboard-Samer Bou Hamdan. All rights reserved.")
+
+		# Draw the charts as they finish
+		charts.fill()
 			
-	with tab4:
+	def render_diagnostic():
+		with span('load'):
+			# Row-level queries go through the configured backend (pandas by default)
+			backend = query_backend.get_backend(st.secrets.get('query_backend', 'pandas'), analytics.DIAGNOSTIC_COLUMNS)
+			# Static charts are cached per dataset version
+			version = dataset_version()
+
+		# The static charts are independent: they are computed in parallel and
+		# drawn into their place in the layout as each one finishes
+		charts = progressive.Charts(chart_workers, progressive_rendering)
+
+		def submit_chart(chart_id, build):
+			charts.add(chart_id, lambda: cached_figure(chart_id, version, build))
+
+		# The static charts run in parallel; the first one to need the results computes them
+		static_results_lock = threading.Lock()
+
+		def static_results():
+			# Every aggregation of the static charts, computed in one pass and shared across sessions
+			with static_results_lock:
+				return cached_result('diagnostic_static', version, {}, lambda: analytics.diagnostic_results(backend, load_summary()))
+
+		def interval_bars(proportion_data, intervals, outcome):
+			"""Error bars spanning the bootstrap confidence interval of each proportion of `outcome`."""
+			proportions = proportion_data[outcome]
+			return dict(type='data', symmetric=False,
+						array=(intervals['upper'][outcome].reindex(proportions.index) - proportions).to_numpy(),
+						arrayminus=(proportions - intervals['lower'][outcome].reindex(proportions.index)).to_numpy())
+
 		intro_container = st.container()
 		with intro_container:
 			
@@ -501,7 +581,7 @@ if check_password():
 				with col1:
 					st.write('')
 				with col2: 
-					st.image('./hospital.gif',use_column_width='auto')
+					assets.image('hospital.gif')
 				with col3:
 					st.write('')
 				
@@ -512,47 +592,49 @@ if check_password():
 		with col1: 
 			st.write('')
 			
-			#Calculate the count of each diagnosis value in the readmitted data
-			readmitted_data=data[data["readmitted"]=='Yes']
-			diagnosis_counts = readmitted_data['Diagnosis'].value_counts().sort_values(ascending=False)
-
-			# Select the top 10 diagnosis values
-			top_10_diagnosis = diagnosis_counts[:10]
-
-			# Create a DataFrame with the diagnosis and count values
-			diagnosis_data = pd.DataFrame({'Diagnosis': top_10_diagnosis.index, 'Count': top_10_diagnosis.values})
+			def comorbidities_treemap():
+				# Top 10 diagnosis values in the readmitted data
+				diagnosis_data = analytics.top_comorbidities(static_results(), 10)
 
-			# Plot the treemap
-			fig = px.treemap(diagnosis_data, path=['Diagnosis'], values='Count')
+				# Plot the treemap
+				fig = px.treemap(diagnosis_data, path=['Diagnosis'], values='Count')
 
-			# Customize the layout
-			fig.update_layout(title='Common Commorbodities across readmitted patients'
-								 ,width=600, height=400,title_font=dict(size=14))
+				# Customize the layout
+				fig.update_layout(title='Common Commorbodities across readmitted patients'
+									 ,width=600, height=400,title_font=dict(size=14))
+				return fig
 
-			# Render the plotly figure using st.plotly_chart
-			st.plotly_chart(fig)
+			# Start computing the plotly figure; it is rendered once ready
+			submit_chart('readmitted_comorbidities', comorbidities_treemap)
 		with col2:
-		  #Group by A1CResult and calculate the average Num_Outpatient
-			avg_num_outpatient = data.groupby(['A1CResult', 'readmitted'])['Num_Outpatient'].mean().reset_index()
-
-			# Create the dot plot using Plotly
-			fig = px.scatter(avg_num_outpatient, x='A1CResult', y='Num_Outpatient', color='readmitted',
-				 title='Average outpatient visits across A1CResult',
-				 labels={'A1CResult': '', 'Num_Outpatient': ''},
-				 template='plotly_white',
-				 color_discrete_map={'No': 'blue', 'Yes': 'red'},
-				 
-						 
-						# Set the desired height
-						)
-				# Set the dot size
-			fig.update_traces(marker=dict(size=14))
-			fig.update_layout(width=600, height=400)
-			# Render the plotly figure using st.plotly_chart
-			st.plotly_chart(fig)
-		# Create the container
-		Diagnosis_container = st.container()
-		with Diagnosis_container:
+			def outpatient_by_a1c_chart():
+				# Average Num_Outpatient per A1CResult and readmission status
+				avg_num_outpatient = analytics.outpatient_by_a1c(static_results())
+
+				# Create the dot plot using Plotly
+				fig = px.scatter(avg_num_outpatient, x='A1CResult', y='Num_Outpatient', color='readmitted',
+					 title='Average outpatient visits across A1CResult',
+					 labels={'A1CResult': '', 'Num_Outpatient': ''},
+					 template='plotly_white',
+					 color_discrete_map={'No': 'blue', 'Yes': 'red'},
+
+
+							# Set the desired height
+							)
+					# Set the dot size
+				fig.update_traces(marker=dict(size=14))
+				fig.update_layout(width=600, height=400)
+				return fig
+
+			# Start computing the plotly figure; it is rendered once ready
+			submit_chart('outpatient_by_a1c', outpatient_by_a1c_chart)
+		# Re-runs on its own when the readmission filter changes
+		@st.fragment
+		@timed_fragment
+		def readmission_filter_panel(alone):
+			# The charts of this panel are drawn once the light content is on the page
+			panel_charts = progressive.Charts(chart_workers, progressive_rendering)
+			panel_results_lock = threading.Lock()
 		
 			col1, col2 ,col3= st.columns(3)
 
@@ -561,36 +643,42 @@ if check_password():
 				
 				readmitted_filter = st.multiselect(
 					"Filter by Readmission Status",
-					data["readmitted"].unique(),
+					backend.unique("readmitted"),
 					default=["Yes"]
 				)
 
-				# Apply the filter to the DataFrame
-				filtered_data = data[data["readmitted"].isin(readmitted_filter)]
-				Medication_Subset = filtered_data[filtered_data['Diabetes_Med'] == 'Yes']
-				a1c_change_counts = Medication_Subset.groupby(['A1CResult', 'Change']).size().unstack()
+				def panel_results():
+					# Every aggregation of this panel, computed in one pass and shared across sessions per readmission filter
+					with panel_results_lock:
+						return cached_result('readmission_filter_panel', version, {'readmitted': readmitted_filter},
+											 lambda: analytics.readmission_filter_results(backend, readmitted_filter))
 
-				# Create the side-by-side bar chart using plotly.graph_objects
-				fig = go.Figure()
+				def a1c_change_chart():
+					a1c_change_counts = analytics.a1c_medication_change(panel_results())
 
-				for col in a1c_change_counts.columns:
-					fig.add_trace(go.Bar(
-						x=a1c_change_counts.index,
-						y=a1c_change_counts[col],
-						name=col
-					))
+					# Create the side-by-side bar chart using plotly.graph_objects
+					fig = go.Figure()
 
-				fig.update_layout(
-					title='A1CResult with Medication Change',
-					xaxis_title='A1C Result',
-					yaxis_title='',
-					barmode='group'
-					,width=450, height=400,
-					legend_title_text='Medication Change'
-				)
+					for col in a1c_change_counts.columns:
+						fig.add_trace(go.Bar(
+							x=a1c_change_counts.index,
+							y=a1c_change_counts[col],
+							name=col
+						))
+
+					fig.update_layout(
+						title='A1CResult with Medication Change',
+						xaxis_title='A1C Result',
+						yaxis_title='',
+						barmode='group'
+						,width=450, height=400,
+						legend_title_text='Medication Change'
+					)
+					return fig
+
+				# Render the plotly figure once the panel is on the page
+				panel_charts.add('a1c_medication_change', a1c_change_chart)
 
-				# Render the plotly figure using st.plotly_chart
-				st.plotly_chart(fig)
 
 			with col2: 
 				st.write('')
@@ -603,7 +691,7 @@ if check_password():
 				st.write('')
 				st.write('')
 				st.write('')
-				st.image('./A1C_charts_approved.png')
+				assets.image('A1C_charts_approved.png')
 			
 			with col3: 
 				st.write('')
@@ -612,198 +700,253 @@ if check_password():
 				st.write('')
 				st.write('')
 				
-				# Apply filters to create the subset
-				filtered_data_subset = filtered_data[(filtered_data['A1CResult'] == '>8') & (filtered_data['Diabetes_Med'] == 'Yes')]
-
-				
-				columns = ['insulin', 'metformin', 'glimepiride']
+				def severe_medications_chart():
+					# Count of each value for each medication in the severe subset (A1CResult > 8), in long format
+					melted_data = analytics.severe_medication_status(panel_results())
 
-				# Calculate the count of each value for each column in the filtered subset
-				counts = {}
-				for column in columns:
-					column_counts = filtered_data_subset[column].value_counts().sort_index()
-					counts[column] = column_counts
+					# Plot the count values using a stacked bar chart
+					fig = px.bar(melted_data, x='Value', y='Count', color='Column', barmode='stack',
+										 labels={'Value': 'Medication Status', 'Count': 'Count'},
+										 title='Medicine prescription for severe patients(A1CResult > 8, Med = Yes)')
 
-				# Create a DataFrame with the count values
-				count_data = pd.DataFrame(counts)
+					fig.update_layout(
+								title_font=dict(size=14),width=450, height=400  # Customize the title font size and weight
+							)
+					return fig
 
-				# Reset index to make columns as categorical values
-				count_data = count_data.reset_index().rename(columns={'index': 'Value'})
+				# Render the plotly figure once the panel is on the page
+				panel_charts.add('severe_medication_status', severe_medications_chart)
 
-				# Melt the DataFrame to convert columns into a single column
-				melted_data = count_data.melt(id_vars='Value', var_name='Column', value_name='Count')
+			panel_charts.fill_fragment(charts, alone)
 
-				# Plot the count values using a stacked bar chart
-				fig = px.bar(melted_data, x='Value', y='Count', color='Column', barmode='stack',
-									 labels={'Value': 'Medication Status', 'Count': 'Count'},
-									 title='Medicine prescription for severe patients(A1CResult > 8, Med = Yes)')
+		readmission_filter_panel()
 
-				fig.update_layout(
-							title_font=dict(size=14),width=450, height=400  # Customize the title font size and weight
-						)
-
-				# Render the plotly figure using st.plotly_chart
-				st.plotly_chart(fig)
-						
-			
-			
-		
 		# Count the occurrences of each unique value in num_lab_procedures
 		col1, col2 = st.columns(2)
 		with col1:
-			# Filter the data for readmitted = YES and NO
-			data2=data[data['Diabetes_Med'] == 'Yes']
-			
-			
-			data_yes = data2[data2['readmitted'] == 'Yes']
-			data_no = data2[data2['readmitted'] == 'No']
+			def lab_procedures_chart():
+				# Count the occurrences of each unique value in num_lab_procedures for
+				# Diabetes_Med = Yes and readmitted = YES and NO
+				lab_procedures = analytics.lab_procedures_by_readmission(static_results()).set_index('num_lab_procedures')
+				value_counts_yes = lab_procedures.loc[lab_procedures['readmitted'] == 'Yes', 'count']
+				value_counts_no = lab_procedures.loc[lab_procedures['readmitted'] == 'No', 'count']
 
-			# Count the occurrences of each unique value in num_lab_procedures for readmitted = YES and NO
-			value_counts_yes = data_yes['num_lab_procedures'].value_counts().sort_index()
-			value_counts_no = data_no['num_lab_procedures'].value_counts().sort_index()
+				# Create two line traces for readmitted = YES and NO
+				trace_yes = go.Scatter(x=value_counts_yes.index, y=value_counts_yes.values, mode='lines', name='Yes')
+				trace_no = go.Scatter(x=value_counts_no.index, y=value_counts_no.values, mode='lines', name='No')
 
-			# Create two line traces for readmitted = YES and NO
-			trace_yes = go.Scatter(x=value_counts_yes.index, y=value_counts_yes.values, mode='lines', name='Yes')
-			trace_no = go.Scatter(x=value_counts_no.index, y=value_counts_no.values, mode='lines', name='No')
+				# Create a line chart with both traces
+				fig = go.Figure(data=[trace_yes, trace_no])
 
-			# Create a line chart with both traces
-			fig = go.Figure(data=[trace_yes, trace_no])
+				# Customize the layout
+				fig.update_layout(
+					  title= '# of Lab procedures for patients on diabetes medication',
 
-			# Customize the layout
-			fig.update_layout(
-				  title= '# of Lab procedures for patients on diabetes medication',
-					
-				xaxis=dict(title=''),
-				yaxis=dict(title='')
-				,width=600, height=400,
-			)
+					xaxis=dict(title=''),
+					yaxis=dict(title='')
+					,width=600, height=400,
+				)
+				return fig
 
 			# Display the chart using Streamlit
-			st.plotly_chart(fig)
-		with col2:	
-			# Filter the dataset for Diabetes_Med = Yes
-			filtered_data = data[data['Diabetes_Med'] == 'Yes']
-
-			# Create a scatter plot with color-coded points
-			scatter_plot = px.scatter(filtered_data, x='num_lab_procedures', y='num_medications', color='readmitted',
-									  title='Scatter Plot: Number of Lab Procedures vs. Number of Medications',
-									  labels={'num_lab_procedures': 'Number of Lab Procedures',
-											  'num_medications': 'Number of Medications'},
-									  color_discrete_map={'No': 'blue', 'Yes': 'red'})
-
-			# Customize the layout of the scatter plot
-			scatter_plot.update_layout(width=600, height=400)
-
-			# Render the plotly figure using st.plotly_chart
-			st.plotly_chart(scatter_plot)
+			submit_chart('lab_procedures_by_readmission', lab_procedures_chart)
+		# Re-runs on its own when the raw points toggle changes
+		@st.fragment
+		@timed_fragment
+		def lab_vs_medications_panel(alone):
+			# The scatter plot is drawn once the light content is on the page
+			panel_charts = progressive.Charts(chart_workers, progressive_rendering)
+			show_raw_points = st.toggle('Show individual encounters', value=False)
+
+			def lab_vs_medications_scatter():
+				if show_raw_points:
+					# One WebGL point per encounter (Diabetes_Med = Yes)
+					filtered_data = analytics.lab_vs_medications_points(backend)
+					scatter_plot = px.scatter(filtered_data, x='num_lab_procedures', y='num_medications', color='readmitted',
+											  render_mode='webgl', opacity=0.5,
+											  title='Scatter Plot: Number of Lab Procedures vs. Number of Medications',
+											  labels={'num_lab_procedures': 'Number of Lab Procedures',
+													  'num_medications': 'Number of Medications'},
+											  color_discrete_map={'No': 'blue', 'Yes': 'red'})
+				else:
+					# Both axes are small integers: draw one marker per distinct point, sized by its count
+					density = analytics.lab_vs_medications_density(static_results())
+					scatter_plot = px.scatter(density, x='num_lab_procedures', y='num_medications', color='readmitted',
+											  size='count', size_max=12, opacity=0.6, hover_data=['count'],
+											  title='Scatter Plot: Number of Lab Procedures vs. Number of Medications',
+											  labels={'num_lab_procedures': 'Number of Lab Procedures',
+													  'num_medications': 'Number of Medications'},
+											  color_discrete_map={'No': 'blue', 'Yes': 'red'})
+					scatter_plot.update_traces(marker=dict(line=dict(width=0)))
+
+				# Customize the layout of the scatter plot
+				scatter_plot.update_layout(width=600, height=400)
+				return scatter_plot
+
+			# Render the plotly figure once the panel is on the page
+			chart_id = 'lab_procedures_vs_medications_raw' if show_raw_points else 'lab_procedures_vs_medications'
+			panel_charts.add(chart_id, lambda: cached_figure(chart_id, version, lab_vs_medications_scatter))
+			panel_charts.fill_fragment(charts, alone)
+
+		with col2:
+			lab_vs_medications_panel()
 		
 		
 		col1, col2 = st.columns(2)
 		with col1:
-			# Group the data by 'HospitalStayLength' and 'readmitted', and calculate the count
-			grouped_data = data.groupby(['HospitalStayLength', 'readmitted']).size().unstack()
-
-			# Calculate the proportion for each category
-			proportion_data = grouped_data.div(grouped_data.sum(axis=1), axis=0)
-
-			# Create the stacked bar chart using Plotly with 'offsetgroup' parameter
-			fig = go.Figure(data=[
-				go.Bar(name='Not Readmitted', x=proportion_data.index, y=proportion_data['No'], offsetgroup=0),
-				go.Bar(name='Readmitted', x=proportion_data.index, y=proportion_data['Yes'], offsetgroup=1, marker_color='red')
-			])
-
-			# Set the bar mode to 'relative' for stacked bars
-			fig.update_layout(barmode='relative', autosize=True)
-
-			# Set the chart title and axis labels
-			fig.update_layout(
-				title='Readmission by Hospital Stay Length',
-				xaxis_title='',
-				yaxis_title='',
-				width=600,
-				height=400
-			)
+			def stay_length_chart():
+				# Proportion of readmitted and not readmitted encounters for each 'HospitalStayLength'
+				proportion_data = analytics.readmission_proportion(static_results(), 'HospitalStayLength')
+				intervals = cached_result('readmission_by_stay_length_intervals', version, {},
+										  lambda: analytics.readmission_proportion_intervals(static_results(), 'HospitalStayLength'))
+
+				# Create the stacked bar chart using Plotly with 'offsetgroup' parameter
+				fig = go.Figure(data=[
+					go.Bar(name='Not Readmitted', x=proportion_data.index, y=proportion_data['No'], offsetgroup=0,
+						   error_y=interval_bars(proportion_data, intervals, 'No')),
+					go.Bar(name='Readmitted', x=proportion_data.index, y=proportion_data['Yes'], offsetgroup=1, marker_color='red',
+						   error_y=interval_bars(proportion_data, intervals, 'Yes'))
+				])
+
+				# Set the bar mode to 'relative' for stacked bars
+				fig.update_layout(barmode='relative', autosize=True)
+
+				# Set the chart title and axis labels
+				fig.update_layout(
+					title='Readmission by Hospital Stay Length',
+					xaxis_title='',
+					yaxis_title='',
+					width=600,
+					height=400
+				)
+				return fig
 
 			# Display the chart on Streamlit app
-			st.plotly_chart(fig)
+			submit_chart('readmission_by_stay_length', stay_length_chart)
 		with col2:
-			# Group the data by 'age_group' and 'readmitted', and calculate the count
-			grouped_data = data.groupby(['age_group', 'readmitted']).size().unstack()
-
-			# Calculate the proportion for each category
-			proportion_data = grouped_data.div(grouped_data.sum(axis=1), axis=0)
-
-			# Create the stacked bar chart using Plotly with 'offsetgroup' parameter
-			fig = go.Figure(data=[
-				go.Bar(name='Not Readmitted', x=proportion_data.index, y=proportion_data['No'], offsetgroup=0),
-				go.Bar(name='Readmitted', x=proportion_data.index, y=proportion_data['Yes'], offsetgroup=1, marker_color='red')
-			])
-
-			# Set the bar mode to 'relative' for stacked bars
-			fig.update_layout(barmode='relative', autosize=True)
+			def age_group_chart():
+				# Proportion of readmitted and not readmitted encounters for each 'age_group'
+				proportion_data = analytics.readmission_proportion(static_results(), 'age_group')
+				intervals = cached_result('readmission_by_age_group_intervals', version, {},
+										  lambda: analytics.readmission_proportion_intervals(static_results(), 'age_group'))
+
+				# Create the stacked bar chart using Plotly with 'offsetgroup' parameter
+				fig = go.Figure(data=[
+					go.Bar(name='Not Readmitted', x=proportion_data.index, y=proportion_data['No'], offsetgroup=0,
+						   error_y=interval_bars(proportion_data, intervals, 'No')),
+					go.Bar(name='Readmitted', x=proportion_data.index, y=proportion_data['Yes'], offsetgroup=1, marker_color='red',
+						   error_y=interval_bars(proportion_data, intervals, 'Yes'))
+				])
+
+				# Set the bar mode to 'relative' for stacked bars
+				fig.update_layout(barmode='relative', autosize=True)
+
+				# Set the chart title and axis labels
+				fig.update_layout(
+					title='Readmission by Age Group',
 
-			# Set the chart title and axis labels
-			fig.update_layout(
-				title='Readmission by Age Group',
-					
-				xaxis_title='',
-				yaxis_title=''
-				,width=600, height=400,
-			)
+					xaxis_title='',
+					yaxis_title=''
+					,width=600, height=400,
+				)
+				return fig
 
 			# Display the chart on Streamlit app
-			st.plotly_chart(fig)
+			submit_chart('readmission_by_age_group', age_group_chart)
 			
 		
-		filtered_data = data
-		col1, col2 = st.columns([1, 3])
+		# Re-runs on its own when one of its selectboxes changes
+		@st.fragment
+		@timed_fragment
+		def cross_filter_panel(alone):
+			# The charts of this panel are drawn once the light content is on the page
+			panel_charts = progressive.Charts(chart_workers, progressive_rendering)
+			filters = {}
+			col1, col2 = st.columns([1, 3])
 		
 		
-		with col1:
-			# Add the dynamic filters
-			st.write('')
-			st.write('')
-			st.write('')
-			st.write('')
-			st.write('')
-			st.write('')
-			st.write('')
-			selected_age = st.selectbox('Select Age', ['All'] + data['age'].unique().tolist(), index=0)
-			selected_gender = st.selectbox('Select Gender', ['All'] + data['gender'].unique().tolist(), index=0)
-			selected_diagnosis = st.selectbox('Select primary Diagnosis', ['All'] + data['Diagnosis1'].unique().tolist(), index=0)
-			# Filter the data based on user selections
+			with col1:
+				# Add the dynamic filters
+				st.write('')
+				st.write('')
+				st.write('')
+				st.write('')
+				st.write('')
+				st.write('')
+				st.write('')
+				selected_age = st.selectbox('Select Age', ['All'] + backend.unique('age'), index=0)
+				selected_gender = st.selectbox('Select Gender', ['All'] + backend.unique('gender'), index=0)
+				selected_diagnosis = st.selectbox('Select primary Diagnosis', ['All'] + backend.unique('Diagnosis1'), index=0)
+				# Filter the data based on user selections
 			
-			if selected_gender != 'All':
-				filtered_data = filtered_data[filtered_data['gender'] == selected_gender]
-			if selected_diagnosis != 'All':
-				filtered_data = filtered_data[filtered_data['Diagnosis1'] == selected_diagnosis]
-			if selected_age != 'All':
-				filtered_data = filtered_data[filtered_data['age'] == selected_age]
-
-		with col2:
-			# Filter the data for Diabetes_Med = 'Yes'
-			filtered_data = filtered_data[filtered_data['Diabetes_Med'] == 'Yes']
-
-			# Group the filtered data by Change, Admissiontype, and readmitted and calculate the count
-			grouped_data = filtered_data.groupby(['Change', 'Admissiontype', 'readmitted']).size().reset_index(name='count')
+				if selected_gender != 'All':
+					filters['gender'] = selected_gender
+				if selected_diagnosis != 'All':
+					filters['Diagnosis1'] = selected_diagnosis
+				if selected_age != 'All':
+					filters['age'] = selected_age
 
-			# Create the stacked bar chart using Plotly Express
-			fig = px.bar(grouped_data, x='Change', y='count', color='readmitted', barmode='stack',
-						 facet_col='Admissiontype', title='Medication Change, Admission Type, and Readmission # for patients on diabetes medication')
-
-			# Set the axis labels
-			fig.update_layout(xaxis_title='', yaxis_title='Count')
-
-			# Remove the facet column labels
-			fig.update_yaxes(title_text='', showticklabels=False)
-			fig.update_xaxes(showticklabels=True, title_text='')
+			with col2:
+				# The risk distribution covers the whole age/gender/diagnosis cohort
+				cohort_filters = dict(filters)
+				# Filter the data for Diabetes_Med = 'Yes'
+				filters['Diabetes_Med'] = 'Yes'
+
+				def change_admission_chart():
+					# Count the filtered rows by Change, Admissiontype, and readmitted (shared across sessions per filter combination)
+					grouped_data = cached_result('change_admission_readmission', version, filters,
+												 lambda: analytics.change_admission_readmission(backend, filters))
+
+					# Create the stacked bar chart using Plotly Express
+					fig = px.bar(grouped_data, x='Change', y='count', color='readmitted', barmode='stack',
+								 facet_col='Admissiontype', title='Medication Change, Admission Type, and Readmission # for patients on diabetes medication')
+
+					# Set the axis labels
+					fig.update_layout(xaxis_title='', yaxis_title='Count')
+
+					# Remove the facet column labels
+					fig.update_yaxes(title_text='', showticklabels=False)
+					fig.update_xaxes(showticklabels=True, title_text='')
+					return fig
+
+				# Display the chart once the panel is on the page
+				panel_charts.add('change_admission_readmission', change_admission_chart, use_container_width=True)
+
+				# Predicted readmission risk of the cohort (the model is trained offline, see risk_model.py)
+				try:
+					model = risk_model.load_model()
+				except ValueError as error:
+					model = None
+					st.warning(str(error))
+				else:
+					if model is None:
+						st.info('Train the readmission risk model with `python risk_model.py` to show predicted risk here.')
+				if model is not None:
+					def risk_chart():
+						risk = cached_result(f'readmission_risk/{model.version}', version, cohort_filters,
+											 lambda: analytics.readmission_risk(backend, model, cohort_filters))
+						fig = px.bar(risk, x='risk_percent', y='count', title='Predicted 30-day readmission risk',
+									 labels={'risk_percent': 'Predicted risk (%)', 'count': 'Encounters'})
+						fig.update_traces(marker_color='#73C2FB')
+						fig.update_layout(bargap=0.1)
+						return fig
+
+					panel_charts.add('readmission_risk', risk_chart, use_container_width=True)
+					training = model.artifact['training']
+					st.caption(f"Model {model.version}, trained {model.artifact['trained_at']} on "
+							   f"{training['rows']:,} encounters (AUC {training['auc']:.2f})")
+
+			panel_charts.fill_fragment(charts, alone)
+
+		cross_filter_panel()
 
-			# Display the chart on Streamlit app
-			st.plotly_chart(fig, use_container_width=True)
 		with st.container():
 			st.markdown("<hr style='border: 1px solid black'>", unsafe_allow_html=True)
 			st.text("2023 Healthcare Analytics Dashboard-Samer Bou Hamdan. All rights reserved.")
-	with tab5: 
+
+		# Draw the static charts as they finish
+		charts.fill()
+	def render_overview():
 		st.write('')
 		st.write('')
 		st.write('***Overview:***')
@@ -830,4 +973,26 @@ if check_password():
 		st.write('*Seniors*: population with age range 50-100')
 		with st.container():
 			st.markdown("<hr style='border: 1px solid black'>", unsafe_allow_html=True)
-			st.text("2023 Healthcare Analytics Dashboard-Samer Bou Hamdan. All rights reserved.")
\ No newline at end of file
+			st.text("2023 Healthcare Analytics Dashboard-Samer Bou Hamdan. All rights reserved.")
+
+	VIEWS = {
+		"Story": render_story,
+		"Metrics & Demographics": render_metrics,
+		"Descriptive Analysis": render_descriptive,
+		"Diagnostic analysis": render_diagnostic,
+		"Overview & definitions": render_overview,
+	}
+	selected_view = st.radio("View", list(VIEWS), horizontal=True, label_visibility="collapsed", key="view")
+	with span(selected_view):
+		VIEWS[selected_view]()
+		instrumentation.milestone('complete')
+
+	# Admin overlay with the timing breakdown of this rerun and the process counters
+	spans = instrumentation.finish_run()
+	if metrics_overlay:
+		with st.sidebar.expander("Rerun timings", expanded=True):
+			show_timings(spans)
+		with st.sidebar.expander("Caches and loaders"):
+			counters = pd.DataFrame([(source, name, value) for source, values in instrumentation.counters().items()
+									 for name, value in values.items()], columns=['source', 'counter', 'value'])
+			st.dataframe(counters.round(3), hide_index=True, use_container_width=True)
\ No newline at end of file
@@ -0,0 +1,336 @@
+"""Hive-partitioned copy of the encounters, for partition pruning.
+
+    Diabestes_Hospital_Encounters.partitions/
+        manifest.json
+        age_group=Seniors/Admissiontype=Emergency/part-0.arrow
+        age_group=Seniors/Admissiontype=Emergency/part-1.arrow
+        ...
+
+Written by ``python ingest.py --partition`` or on first use by the
+``partitioned`` query backend, from the Arrow sidecar. Each batch appended
+to the sidecar since is written as one more ``part-N.arrow`` file in the
+partitions it has rows in, and the manifest is extended; the dataset is
+only rewritten when the sidecar itself changes. Partition files are
+uncompressed Arrow IPC, memory-mapped like the sidecar, and keep the
+original row number of every encounter so that results come out in the
+same order.
+
+manifest.json records the sidecar version and the batches the dataset
+holds, and per partition its files, row count, size and the values each
+filter column (INDEXED_COLUMNS) takes in it. A filter state
+opens only the partitions whose values intersect the accepted values of
+every filtered column; because age determines age_group, a filter on age
+opens only the partitions of its age group. Every query logs how many
+partitions, rows and bytes it skipped (at INFO level), and
+pruning_stats() keeps the totals, which are exported with the dashboard
+metrics and shown in its admin overlay (see instrumentation.py).
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from bitmap_index import INDEXED_COLUMNS, accepted_values
+from ingest import DATA_PATH, combine_versions, concat_tables, file_lock, open_sidecar, read_batches
+from instrumentation import register_counters
+
+logger = logging.getLogger(__name__)
+
+# Low-cardinality partition keys, outermost first
+PARTITION_COLUMNS = ['age_group', 'Admissiontype']
+
+# Original row number of each encounter, stored in every partition
+ROW_COLUMN = '__row'
+
+# Hive's directory name for a missing key value
+NULL_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+MANIFEST_NAME = 'manifest.json'
+
+# Bumped whenever the manifest layout changes; older datasets are rewritten
+MANIFEST_FORMAT = 2
+
+_lock = threading.Lock()
+# Held while a dataset is checked or rebuilt
+_build_lock = threading.Lock()
+# Partitions directory -> PartitionedDataset of the version it holds
+_datasets = {}
+_stats = {'queries': 0, 'partitions_opened': 0, 'partitions_skipped': 0, 'rows_read': 0, 'rows_skipped': 0,
+          'bytes_read': 0, 'bytes_skipped': 0}
+
+
+def partitions_dir(csv_path):
+    """Returns the partitioned dataset directory for `csv_path`."""
+    return os.path.splitext(csv_path)[0] + '.partitions'
+
+
+def _partition_name(keys):
+    parts = [f'{column}={NULL_PARTITION if pd.isna(value) else quote(str(value), safe="")}'
+             for column, value in zip(PARTITION_COLUMNS, keys)]
+    return '/'.join(parts)
+
+
+def _value_stats(series):
+    """Returns the distinct values of `series` as strings, and whether it has missing values."""
+    values = series.dropna().unique()
+    return {'values': sorted(str(value) for value in values), 'nulls': bool(series.isna().any())}
+
+
+def build_partitions(csv_path=DATA_PATH):
+    """Brings the partitioned dataset of `csv_path` up to date with the loaded dataset. Returns its directory."""
+    # One process at a time writes the dataset
+    with file_lock(partitions_dir(csv_path)):
+        _update_partitions(csv_path)
+    return partitions_dir(csv_path)
+
+
+def _update_partitions(csv_path):
+    """Writes the batches appended since the manifest was written, or the whole dataset if it is of another sidecar."""
+    from data_loader import dataset_batches
+
+    path = partitions_dir(csv_path)
+    base_version, batches = dataset_batches(csv_path)
+    version = combine_versions(base_version, [batch_version for _, batch_version in batches])
+    manifest = _read_manifest(path)
+    if manifest is not None and manifest['version'] == version:
+        return manifest
+
+    names = [name for name, _ in batches]
+    if manifest is None or manifest.get('base_version') != base_version or not set(manifest['batches']) <= set(names):
+        tables = {name: table for name, table, _ in read_batches(csv_path, base_version, skip=())}
+        table = concat_tables([open_sidecar(csv_path, base_version)] + [tables[name] for name in names])
+        return _write_partitions(csv_path, table, base_version, names, version)
+
+    new_names = [name for name in names if name not in manifest['batches']]
+    tables = {name: table for name, table, _ in read_batches(csv_path, base_version, skip=manifest['batches'])}
+    return _append_partitions(csv_path, manifest, [(name, tables[name]) for name in new_names], version)
+
+
+def _write_parts(path, table, first_row, partitions):
+    """Writes the rows of `table` as one new file in each partition they belong to, under `path`.
+
+    `partitions` maps a partition name to its manifest entry, which is added
+    or updated; rows are numbered from `first_row`. Returns the distinct
+    values of the filter columns in order of appearance.
+    """
+    row_numbers = np.arange(first_row, first_row + table.num_rows, dtype=np.int64)
+    table = table.append_column(ROW_COLUMN, pa.array(row_numbers))
+    stats_columns = sorted(set(PARTITION_COLUMNS + INDEXED_COLUMNS))
+    keys = table.select(stats_columns).to_pandas()
+    for group_keys, positions in keys.groupby(PARTITION_COLUMNS, observed=True, dropna=False, sort=True).indices.items():
+        name = _partition_name(group_keys if isinstance(group_keys, tuple) else (group_keys,))
+        partition = partitions.setdefault(name, {'name': name, 'files': [], 'rows': 0, 'bytes': 0, 'columns': {}})
+        file_name = f"part-{len(partition['files'])}.arrow"
+        file_path = os.path.join(path, name, file_name)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        part = table.take(pa.array(positions))
+        with pa.OSFile(file_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, part.schema) as writer:
+                writer.write_table(part)
+
+        rows = keys.iloc[positions]
+        partition['files'].append(file_name)
+        partition['rows'] += len(positions)
+        partition['bytes'] += os.path.getsize(file_path)
+        for column in INDEXED_COLUMNS:
+            stats = _value_stats(rows[column])
+            previous = partition['columns'].get(column)
+            if previous is not None:
+                stats = {'values': sorted(set(previous['values']) | set(stats['values'])),
+                         'nulls': previous['nulls'] or stats['nulls']}
+            partition['columns'][column] = stats
+    return {column: keys[column].dropna().unique().tolist() for column in INDEXED_COLUMNS}
+
+
+def _write_manifest(path, manifest):
+    """Writes `manifest` into the dataset directory `path` atomically."""
+    tmp_path = os.path.join(path, f'{MANIFEST_NAME}.{os.getpid()}.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, os.path.join(path, MANIFEST_NAME))
+
+
+def _write_partitions(csv_path, table, base_version, batches, version):
+    """Writes `table`, the sidecar of `base_version` plus `batches`, as a new dataset. Returns its manifest."""
+    start = time.perf_counter()
+    path = partitions_dir(csv_path)
+    # Build next to the live dataset and swap it in, so readers never see a partial one
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    partitions = {}
+    unique = _write_parts(tmp_path, table, 0, partitions)
+    manifest = {
+        'format': MANIFEST_FORMAT,
+        'version': version,
+        'base_version': base_version,
+        'batches': list(batches),
+        'partition_columns': PARTITION_COLUMNS,
+        'rows': table.num_rows,
+        # Distinct values in order of appearance, as the other backends return them
+        'unique': unique,
+        'partitions': list(partitions.values()),
+    }
+    _write_manifest(tmp_path, manifest)
+
+    old_path = path + '.old'
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.rename(path, old_path)
+    os.rename(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+    logger.info("Wrote %d partitions of %s (%d rows) in %.2fs", len(partitions), csv_path, table.num_rows,
+                time.perf_counter() - start)
+    return manifest
+
+
+def _append_partitions(csv_path, manifest, batches, version):
+    """Writes each of `batches` ((name, table) appended to the dataset of `manifest`) as new part files.
+
+    Readers keep using the files of the manifest they opened until the
+    extended manifest replaces it. Returns the new manifest.
+    """
+    start = time.perf_counter()
+    path = partitions_dir(csv_path)
+    partitions = {partition['name']: partition for partition in manifest['partitions']}
+    rows = manifest['rows']
+    unique = {column: list(values) for column, values in manifest['unique'].items()}
+    for name, table in batches:
+        batch_unique = _write_parts(path, table, rows, partitions)
+        rows += table.num_rows
+        for column, values in batch_unique.items():
+            unique[column] += [value for value in values if value not in unique[column]]
+
+    manifest = dict(manifest, version=version, batches=manifest['batches'] + [name for name, _ in batches],
+                    rows=rows, unique=unique, partitions=list(partitions.values()))
+    _write_manifest(path, manifest)
+    logger.info("Appended %d batch(es) to the partitions of %s (%d rows) in %.2fs", len(batches), csv_path,
+                sum(table.num_rows for _, table in batches), time.perf_counter() - start)
+    return manifest
+
+
+def _read_manifest(path):
+    """Returns the manifest of the dataset at `path`, or None if missing or in an older format."""
+    try:
+        with open(os.path.join(path, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    return manifest if manifest.get('format') == MANIFEST_FORMAT else None
+
+
+class PartitionedDataset:
+    """The partitions listed in `manifest`, memory-mapped as queries first need them."""
+
+    def __init__(self, path, manifest):
+        self.path = path
+        self.manifest = manifest
+        self.version = manifest['version']
+        self._tables = {}
+
+    def _table(self, partition):
+        name = partition['name']
+        table = self._tables.get(name)
+        if table is None:
+            tables = [pa.ipc.open_file(pa.memory_map(os.path.join(self.path, name, file_name), 'r')).read_all()
+                      for file_name in partition['files']]
+            table = concat_tables(tables)
+            self._tables[name] = table
+        return table
+
+    def prune(self, filters):
+        """Returns the partitions whose values can match `filters`."""
+        matching = []
+        for partition in self.manifest['partitions']:
+            stats = partition['columns']
+            if all(column not in stats or set(stats[column]['values']) & {str(value) for value in accepted_values(accepted)}
+                   for column, accepted in (filters or {}).items()):
+                matching.append(partition)
+        return matching
+
+    def read(self, columns, filters=None, ordered=True):
+        """Returns `columns` of the rows matching `filters`, in their original order if `ordered`.
+
+        Only the partitions that can match are opened; the pruning is logged.
+        """
+        filters = filters or {}
+        partitions = self.prune(filters)
+        read_columns = list(dict.fromkeys(list(columns) + list(filters) + [ROW_COLUMN]))
+        tables = [self._table(partition).select(read_columns) for partition in partitions]
+        self._log_pruning(partitions, filters)
+
+        if tables:
+            data = concat_tables(tables).to_pandas()
+        else:
+            data = pd.DataFrame({column: pd.Series(dtype=object) for column in read_columns})
+        mask = np.ones(len(data), dtype=bool)
+        for column, accepted in filters.items():
+            mask &= data[column].isin(accepted_values(accepted)).to_numpy()
+        data = data[mask]
+        if ordered:
+            data = data.sort_values(ROW_COLUMN)
+        for column in columns:
+            series = data[column]
+            # Same category order as the shared frames
+            if hasattr(series, 'cat') and not series.cat.categories.is_monotonic_increasing:
+                data[column] = series.cat.reorder_categories(sorted(series.cat.categories))
+        return data[list(columns)].reset_index(drop=True)
+
+    def unique(self, column):
+        """Returns the distinct values of `column` in order of appearance."""
+        if column in self.manifest['unique']:
+            return list(self.manifest['unique'][column])
+        return self.read([column])[column].dropna().unique().tolist()
+
+    def _log_pruning(self, opened, filters):
+        partitions = self.manifest['partitions']
+        rows_read = sum(partition['rows'] for partition in opened)
+        bytes_read = sum(partition['bytes'] for partition in opened)
+        total_bytes = sum(partition['bytes'] for partition in partitions)
+        with _lock:
+            _stats['queries'] += 1
+            _stats['partitions_opened'] += len(opened)
+            _stats['partitions_skipped'] += len(partitions) - len(opened)
+            _stats['rows_read'] += rows_read
+            _stats['rows_skipped'] += self.manifest['rows'] - rows_read
+            _stats['bytes_read'] += bytes_read
+            _stats['bytes_skipped'] += total_bytes - bytes_read
+        logger.info("Partition pruning for %s: opened %d/%d partitions, %d/%d rows, %.1f/%.1f MB",
+                    sorted(filters) or 'no filter', len(opened), len(partitions), rows_read, self.manifest['rows'],
+                    bytes_read / 1024 / 1024, total_bytes / 1024 / 1024)
+
+
+def open_partitions(csv_path=DATA_PATH):
+    """Returns the partitioned dataset of `csv_path`, brought up to date for the current dataset version."""
+    from data_loader import dataset_version
+
+    path = partitions_dir(csv_path)
+    version = dataset_version(csv_path)
+    with _build_lock:
+        dataset = _datasets.get(path)
+        if dataset is None or dataset.version != version:
+            manifest = _read_manifest(path)
+            if manifest is None or manifest['version'] != version:
+                # Server processes starting together write the dataset once
+                with file_lock(path):
+                    manifest = _update_partitions(csv_path)
+            dataset = PartitionedDataset(path, manifest)
+            _datasets[path] = dataset
+        return dataset
+
+
+def pruning_stats():
+    """Returns a copy of the pruning counters (partitions, rows and bytes read and skipped)."""
+    with _lock:
+        return dict(_stats)
+
+
+register_counters('partition_pruning', pruning_stats)
@@ -0,0 +1,77 @@
+"""Progressive rendering of the dashboard views.
+
+A view draws its light content first - headers, KPI cards, filter widgets -
+and leaves a placeholder wherever a heavy chart goes:
+
+    charts = progressive.Charts(workers)
+    charts.add('age', lambda: cached_image('age', version, age_chart), 'image', use_column_width=True)
+    ...
+    charts.fill()
+
+Streamlit sends each element to the browser as soon as the script creates
+it, so the page shows its layout and numbers while the charts are still
+being computed. fill() records the rerun's time to first content and then
+draws each chart into its placeholder as soon as it is ready.
+
+A fragment keeps Charts of its own and ends with fill_fragment(): when it
+reruns alone its charts are drawn there, and during a full rerun they are
+handed to the view's Charts, so that they are drawn once the light content
+of the whole page is on it.
+
+With `workers` > 1 a chart starts computing on chart_executor's pool as soon
+as it is added; otherwise fill() computes the charts one after another on
+the script thread, which pyplot charts need since pyplot is not
+thread-safe. With `progressive` off each chart is computed and drawn where
+it is added, top to bottom.
+"""
+import streamlit as st
+
+import chart_executor
+import instrumentation
+
+LOADING_TEXT = 'Loading chart...'
+
+
+class Charts:
+    """The heavy charts of one view, drawn into placeholders once they are computed."""
+
+    def __init__(self, workers=1, progressive=True):
+        self.workers = workers
+        self.progressive = progressive
+        # chart_id -> (placeholder, compute, Future or None, element, kwargs)
+        self._pending = {}
+
+    def add(self, chart_id, compute, element='plotly_chart', **kwargs):
+        """Reserves the place of `chart_id`, drawn as ``st.<element>(compute(), **kwargs)``."""
+        if not self.progressive:
+            getattr(st, element)(compute(), **kwargs)
+            return
+        placeholder = st.empty()
+        placeholder.caption(LOADING_TEXT)
+        future = chart_executor.submit(compute, self.workers) if self.workers > 1 else None
+        self._pending[chart_id] = (placeholder, compute, future, element, kwargs)
+
+    def _draw(self, chart_id, result):
+        placeholder, _, _, element, kwargs = self._pending[chart_id]
+        getattr(placeholder, element)(result, **kwargs)
+
+    def fill(self):
+        """Records the time to first content, then draws every chart as it becomes ready."""
+        instrumentation.milestone('first_content')
+        futures = {}
+        for chart_id, (_, compute, future, _, _) in self._pending.items():
+            if future is None:
+                self._draw(chart_id, compute())
+            else:
+                futures[chart_id] = future
+        for chart_id, result in chart_executor.completed(futures):
+            self._draw(chart_id, result)
+        self._pending = {}
+
+    def fill_fragment(self, view, alone):
+        """Draws the charts of a fragment now if it reruns `alone`, else hands them to `view`, the page's Charts."""
+        if alone:
+            self.fill()
+        else:
+            view._pending.update(self._pending)
+            self._pending = {}
@@ -0,0 +1,296 @@
+"""Query backends for the row-level charts.
+
+The Diagnostic view and the length-of-stay histogram ask a backend for
+grouped counts, means, distinct values and filtered columns instead of
+working on a DataFrame directly:
+
+    backend.run([aggregation.count('stay_length', 'HospitalStayLength', 'readmitted')])
+    backend.unique('readmitted')
+    backend.select(['time_in_hospital'], {'Diabetes_Med': 'Yes'})
+
+``pandas`` (the default) answers these from the shared in-memory frames and
+the bitmap index. ``sqlite`` keeps the encounters in an embedded database
+file next to the CSV and pushes the filters and GROUP BYs down as SQL, so the
+Streamlit process only holds query results. ``partitioned`` reads the
+hive-partitioned copy of the encounters (see ``partitions.py``) and opens
+only the partitions a filter state can match. All return results in the
+same shape; ``benchmarks/backend_parity.py`` checks that every chart comes
+out the same.
+
+The backend is selected with ``query_backend`` in ``.streamlit/secrets.toml``.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+import pyarrow as pa
+
+import aggregation
+import partitions
+from bitmap_index import INDEXED_COLUMNS, accepted_values
+from data_loader import dataset_batches, dataset_version, load_bitmap_index, load_codes, load_encounters
+from ingest import DATA_PATH, combine_versions, file_lock, open_sidecar, read_batches
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('pandas', 'sqlite', 'partitioned')
+
+# Rows inserted per statement batch when the database is built
+INSERT_BATCH_ROWS = 50_000
+
+_lock = threading.Lock()
+# Dataset version each database file was last checked or built for
+_database_versions = {}
+
+
+class PandasBackend:
+    """Answers queries from the shared frame of `columns` and the bitmap index."""
+
+    def __init__(self, columns, path=DATA_PATH):
+        self.path = path
+        self.data = load_encounters(path, columns=columns)
+
+    @property
+    def index(self):
+        # Only built once a filtered query needs it
+        return load_bitmap_index(self.path)
+
+    def _positions(self, filters):
+        return self.index.positions(self.index.mask(filters)) if filters else None
+
+    def run(self, aggregations, filters=None):
+        """Computes `aggregations` over the rows matching `filters` (see aggregation.run)."""
+        codes = load_codes(self.path, aggregation.group_columns(aggregations))
+        return aggregation.run(self.data, aggregations, self._positions(filters), codes)
+
+    def unique(self, column):
+        """Returns the distinct values of `column` in order of appearance."""
+        return self.data[column].unique().tolist()
+
+    def count_combinations(self, columns, filters=None):
+        """Returns each combination of `columns` among the rows matching `filters` (see aggregation.combinations)."""
+        codes = load_codes(self.path, columns)
+        return aggregation.combinations(self.data, columns, self._positions(filters), codes)
+
+    def select(self, columns, filters=None):
+        """Returns `columns` for the rows matching `filters`."""
+        if not filters:
+            return self.data[columns]
+        return self.index.take(self.data, self.index.mask(filters), columns)
+
+
+def database_path(csv_path):
+    """Returns the SQLite database path for `csv_path`."""
+    return os.path.splitext(csv_path)[0] + '.sqlite'
+
+
+def _sql_type(arrow_type):
+    if pa.types.is_integer(arrow_type) or pa.types.is_boolean(arrow_type):
+        return 'INTEGER'
+    if pa.types.is_floating(arrow_type):
+        return 'REAL'
+    return 'TEXT'
+
+
+def _quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+def _insert_rows(connection, table):
+    insert = f"INSERT INTO encounters VALUES ({', '.join('?' * table.num_columns)})"
+    for batch in table.to_batches(max_chunksize=INSERT_BATCH_ROWS):
+        connection.executemany(insert, zip(*[column.to_pylist() for column in batch.columns]))
+
+
+def _create_database(path, table, base_version):
+    """Writes the sidecar `table` to a new database at `path`, with no batches recorded yet."""
+    # Build into a temporary file of this process so readers never open a partial database
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    start = time.perf_counter()
+    connection = sqlite3.connect(tmp_path)
+    try:
+        columns = ', '.join(f'{_quote(field.name)} {_sql_type(field.type)}' for field in table.schema)
+        connection.execute(f'CREATE TABLE encounters ({columns})')
+        _insert_rows(connection, table)
+        for column in INDEXED_COLUMNS:
+            connection.execute(f'CREATE INDEX {_quote("idx_" + column)} ON encounters ({_quote(column)})')
+        connection.execute('CREATE TABLE metadata (key TEXT PRIMARY KEY, value TEXT)')
+        connection.executemany('INSERT INTO metadata VALUES (?, ?)', [('version', base_version), ('base_version', base_version)])
+        connection.commit()
+    finally:
+        connection.close()
+    os.replace(tmp_path, path)
+    logger.info("Built %s (%d rows) in %.2fs", path, table.num_rows, time.perf_counter() - start)
+
+
+def _read_metadata(path):
+    """Returns the metadata of the database at `path` as a dict, or None if there is none."""
+    if not os.path.exists(path):
+        return None
+    connection = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        return dict(connection.execute('SELECT key, value FROM metadata').fetchall())
+    except sqlite3.Error:
+        return None
+    finally:
+        connection.close()
+
+
+def build_database(csv_path=DATA_PATH):
+    """Brings the SQLite database of `csv_path` up to date with the loaded dataset.
+
+    A database of the same sidecar only gets the rows of the batches
+    appended since it was written (see ingest.append_batch), in one
+    transaction; otherwise it is written from the sidecar, one Arrow batch
+    at a time, with the filter columns indexed. The metadata table records
+    the sidecar version and the version of every batch it holds (keys
+    ``batch:<name>``). Returns the database path.
+    """
+    path = database_path(csv_path)
+    # One process at a time updates the database
+    with file_lock(path):
+        base_version, batches = dataset_batches(csv_path)
+        metadata = _read_metadata(path)
+        stored = {key[len('batch:'):] for key in metadata or () if key.startswith('batch:')}
+        if metadata is None or metadata.get('base_version') != base_version or not stored <= {name for name, _ in batches}:
+            _create_database(path, open_sidecar(csv_path, base_version), base_version)
+            stored = set()
+
+        new_batches = [(name, version) for name, version in batches if name not in stored]
+        if new_batches:
+            start = time.perf_counter()
+            tables = {name: table for name, table, _ in read_batches(csv_path, base_version, skip=stored)}
+            connection = sqlite3.connect(path)
+            try:
+                for name, version in new_batches:
+                    _insert_rows(connection, tables[name])
+                    connection.execute('INSERT INTO metadata VALUES (?, ?)', ('batch:' + name, version))
+                connection.execute("UPDATE metadata SET value = ? WHERE key = 'version'",
+                                   (combine_versions(base_version, [version for _, version in batches]),))
+                connection.commit()
+            finally:
+                connection.close()
+            logger.info("Added %d batch(es) to %s in %.2fs", len(new_batches), path, time.perf_counter() - start)
+    return path
+
+
+def _database_version(path):
+    """Returns the dataset version stored in the database at `path`, or None."""
+    metadata = _read_metadata(path)
+    return metadata.get('version') if metadata is not None else None
+
+
+class SQLiteBackend:
+    """Answers queries with SQL against the embedded database for `path`.
+
+    The database is written by ``python ingest.py --sqlite``. If it is
+    missing or holds another version of the data, it is brought up to date
+    here (see build_database).
+    """
+
+    def __init__(self, path=DATA_PATH):
+        self.path = database_path(path)
+        version = dataset_version(path)
+        with _lock:
+            if _database_versions.get(self.path) != version and _database_version(self.path) != version:
+                build_database(path)
+            _database_versions[self.path] = version
+
+    def _query(self, sql, params=()):
+        # One read-only connection per query: sessions run on different threads
+        connection = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True)
+        try:
+            return connection.execute(sql, params).fetchall()
+        finally:
+            connection.close()
+
+    def _where(self, filters, not_null=()):
+        clauses = [f'{_quote(column)} IS NOT NULL' for column in not_null]
+        params = []
+        for column, accepted in (filters or {}).items():
+            accepted = accepted_values(accepted)
+            clauses.append(f"{_quote(column)} IN ({', '.join('?' * len(accepted))})")
+            params.extend(accepted)
+        return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+
+    def run(self, aggregations, filters=None):
+        """Computes `aggregations` with one GROUP BY query each (see aggregation.run)."""
+        results = {}
+        for declared in aggregations:
+            by = ', '.join(_quote(column) for column in declared.by)
+            value = 'COUNT(*)' if declared.value is None else f'AVG({_quote(declared.value)})'
+            # Rows with a missing group value are skipped, as in groupby()
+            where, params = self._where(filters, not_null=declared.by)
+            rows = self._query(f'SELECT {by}, {value} FROM encounters{where} GROUP BY {by} ORDER BY {by}', params)
+
+            result = pd.DataFrame.from_records(rows, columns=list(declared.by) + ['value']).set_index(list(declared.by))['value']
+            if declared.value is None:
+                results[declared.name] = result.astype('int64').rename(None)
+            else:
+                results[declared.name] = result.astype('float64').rename(declared.value)
+        return results
+
+    def unique(self, column):
+        """Returns the distinct values of `column` in order of appearance."""
+        column = _quote(column)
+        return [row[0] for row in self._query(f'SELECT {column} FROM encounters GROUP BY {column} ORDER BY MIN(rowid)')]
+
+    def count_combinations(self, columns, filters=None):
+        """Returns each combination of `columns` among the rows matching `filters` (see aggregation.combinations)."""
+        # GROUP BY keeps the NULLs as groups of their own
+        where, params = self._where(filters)
+        quoted = ', '.join(_quote(column) for column in columns)
+        rows = self._query(f'SELECT {quoted}, COUNT(*) FROM encounters{where} GROUP BY {quoted}', params)
+        return pd.DataFrame.from_records(rows, columns=list(columns) + ['count'])
+
+    def select(self, columns, filters=None):
+        """Returns `columns` for the rows matching `filters`."""
+        where, params = self._where(filters)
+        rows = self._query(f"SELECT {', '.join(_quote(column) for column in columns)} FROM encounters{where} ORDER BY rowid", params)
+        return pd.DataFrame.from_records(rows, columns=columns)
+
+
+class PartitionedBackend:
+    """Answers queries from the partitions of `path` that the filters can match.
+
+    The partitioned dataset is (re)built when it is missing or holds another
+    version of the data.
+    """
+
+    def __init__(self, path=DATA_PATH):
+        self.dataset = partitions.open_partitions(path)
+
+    def run(self, aggregations, filters=None):
+        """Computes `aggregations` over the rows matching `filters` (see aggregation.run)."""
+        columns = {column for declared in aggregations for column in declared.by}
+        columns |= {declared.value for declared in aggregations if declared.value is not None}
+        data = self.dataset.read(sorted(columns), filters, ordered=False)
+        return aggregation.run(data, aggregations)
+
+    def unique(self, column):
+        """Returns the distinct values of `column` in order of appearance."""
+        return self.dataset.unique(column)
+
+    def count_combinations(self, columns, filters=None):
+        """Returns each combination of `columns` among the rows matching `filters` (see aggregation.combinations)."""
+        return aggregation.combinations(self.dataset.read(columns, filters, ordered=False), columns)
+
+    def select(self, columns, filters=None):
+        """Returns `columns` for the rows matching `filters`."""
+        return self.dataset.read(columns, filters)
+
+
+def get_backend(name='pandas', columns=None, path=DATA_PATH):
+    """Returns the query backend `name`; `columns` are the columns the pandas backend materializes."""
+    if name == 'pandas':
+        return PandasBackend(columns, path)
+    if name == 'sqlite':
+        return SQLiteBackend(path)
+    if name == 'partitioned':
+        return PartitionedBackend(path)
+    raise ValueError(f"Unknown query backend {name!r}; expected one of {', '.join(BACKENDS)}")
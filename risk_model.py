@@ -0,0 +1,229 @@
+"""Readmission-within-30-days risk model.
+
+A logistic regression over the categorical columns the Diagnostic view
+charts readmission against (FEATURES). It is trained offline:
+
+    python risk_model.py [--csv-path PATH] [--backend pandas]
+
+and stored as a small JSON artifact next to the CSV, recording the format
+version, the dataset version it was trained on, a content hash of its
+coefficients and its training metrics. The dashboard only loads and
+applies it.
+
+Every feature is categorical, so training works on the counts of each
+combination of feature values instead of on the rows, and scoring is one
+table lookup per feature: the coefficients of a column are laid out in the
+order of the data's category codes and indexed with the codes of the whole
+batch at once, which scores millions of encounters per second (see
+benchmarks/risk_scoring.py).
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import aggregation
+from ingest import DATA_PATH
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever the artifact layout changes; older artifacts must be retrained
+FORMAT_VERSION = 1
+
+FEATURES = ['HospitalStayLength', 'age_group', 'A1CResult', 'Change', 'Diabetes_Med']
+TARGET = 'readmitted'
+POSITIVE = 'Yes'
+# Feature value standing for a missing value (e.g. no A1C test), which is informative
+MISSING = 'missing'
+
+L2_PENALTY = 1.0
+MAX_ITERATIONS = 50
+TOLERANCE = 1e-8
+
+_lock = threading.Lock()
+# Artifact path -> (mtime, RiskModel)
+_models = {}
+
+
+def model_path(csv_path):
+    """Returns the risk model artifact path for `csv_path`."""
+    return os.path.splitext(csv_path)[0] + '.risk_model.json'
+
+
+class RiskModel:
+    """A trained model: an intercept plus one coefficient per feature value."""
+
+    def __init__(self, artifact):
+        self.artifact = artifact
+        self.intercept = artifact['intercept']
+        self.coefficients = artifact['coefficients']
+
+    @property
+    def version(self):
+        return self.artifact['model_version']
+
+    def _lookup(self, column, labels):
+        """Returns the coefficients of `column` in the order of `labels`, then that of a missing value."""
+        weights = self.coefficients[column]
+        # Values not seen in training score as the reference level
+        return np.array([weights.get(str(label), 0.0) for label in labels] + [weights.get(MISSING, 0.0)])
+
+    def score(self, data):
+        """Returns the predicted readmission probability of every row of `data`."""
+        logits = np.full(len(data), self.intercept)
+        for column in FEATURES:
+            codes, labels = aggregation.encode(data[column])
+            # Code -1 (missing) picks the last entry
+            logits += self._lookup(column, labels)[codes]
+        return 1.0 / (1.0 + np.exp(-logits))
+
+
+def _design(groups):
+    """Returns the one-hot design matrix of `groups` (a frame of feature values) and its columns."""
+    names = []
+    blocks = [np.ones((len(groups), 1))]
+    for column in FEATURES:
+        values = pd.Categorical(groups[column])
+        # The first category is the reference level
+        categories = list(values.categories)[1:]
+        names += [(column, category) for category in categories]
+        blocks.append((values.codes[:, None] == np.arange(1, len(categories) + 1)).astype(float))
+    return np.hstack(blocks), names
+
+
+def _auc(scores, positives, negatives):
+    """Area under the ROC curve of grouped scores with their positive and negative counts."""
+    order = np.argsort(scores)
+    scores, positives, negatives = scores[order], positives[order], negatives[order]
+    # Ties are groups with the same score: they count half
+    _, starts = np.unique(scores, return_index=True)
+    tied_positives = np.add.reduceat(positives, starts)
+    tied_negatives = np.add.reduceat(negatives, starts)
+    negatives_below = np.cumsum(tied_negatives) - tied_negatives
+    pairs = tied_positives.sum() * tied_negatives.sum()
+    return float((tied_positives * (negatives_below + tied_negatives / 2)).sum() / pairs)
+
+
+def _with_missing(series):
+    """Returns `series` with missing values replaced by MISSING."""
+    if hasattr(series, 'cat') and MISSING not in series.cat.categories:
+        series = series.cat.add_categories([MISSING])
+    return series.fillna(MISSING)
+
+
+def train(backend, l2=L2_PENALTY, version=None):
+    """Fits the model to every encounter of `backend` and returns its artifact (a dict)."""
+    start = time.perf_counter()
+    rows = backend.select(FEATURES + [TARGET])
+    rows = rows[rows[TARGET].notna()]
+    features = pd.DataFrame({column: _with_missing(rows[column]) for column in FEATURES})
+    features['positive'] = (rows[TARGET] == POSITIVE).to_numpy()
+    counts = features.groupby(FEATURES, observed=True)['positive'].agg(['sum', 'count'])
+    groups = counts.index.to_frame(index=False)
+    positives = counts['sum'].to_numpy(dtype=float)
+    totals = counts['count'].to_numpy(dtype=float)
+
+    # Newton's method on the binomial log-likelihood of the groups, with an L2
+    # penalty on everything but the intercept
+    design, names = _design(groups)
+    penalty = np.full(design.shape[1], l2)
+    penalty[0] = 0.0
+    weights = np.zeros(design.shape[1])
+    weights[0] = np.log(positives.sum() / (totals.sum() - positives.sum()))
+    for iteration in range(1, MAX_ITERATIONS + 1):
+        probabilities = 1.0 / (1.0 + np.exp(-design @ weights))
+        gradient = design.T @ (positives - totals * probabilities) - penalty * weights
+        hessian = (design.T * (totals * probabilities * (1 - probabilities))) @ design + np.diag(penalty)
+        step = np.linalg.solve(hessian, gradient)
+        weights += step
+        if np.abs(step).max() < TOLERANCE:
+            break
+
+    probabilities = 1.0 / (1.0 + np.exp(-design @ weights))
+    log_loss = -(positives * np.log(probabilities) + (totals - positives) * np.log1p(-probabilities)).sum()
+    coefficients = {column: {} for column in FEATURES}
+    for column in FEATURES:
+        # The reference level keeps a coefficient of 0
+        coefficients[column][str(pd.Categorical(groups[column]).categories[0])] = 0.0
+    for (column, category), weight in zip(names, weights[1:]):
+        coefficients[column][str(category)] = float(weight)
+
+    artifact = {
+        'format_version': FORMAT_VERSION,
+        'features': FEATURES,
+        'intercept': float(weights[0]),
+        'coefficients': coefficients,
+        'dataset_version': version,
+        'trained_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'training': {
+            'rows': int(totals.sum()),
+            'groups': len(groups),
+            'iterations': iteration,
+            'l2_penalty': l2,
+            'base_rate': float(positives.sum() / totals.sum()),
+            'log_loss': float(log_loss / totals.sum()),
+            'auc': _auc(probabilities, positives, totals - positives),
+        },
+    }
+    fitted = json.dumps([artifact['intercept'], coefficients], sort_keys=True)
+    artifact['model_version'] = hashlib.sha256(fitted.encode()).hexdigest()[:12]
+    logger.info("Trained risk model %s on %d rows in %.2fs", artifact['model_version'], totals.sum(),
+                time.perf_counter() - start)
+    return artifact
+
+
+def write_model(artifact, path):
+    """Writes `artifact` to `path` atomically."""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(artifact, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def load_model(csv_path=DATA_PATH):
+    """Returns the trained RiskModel for `csv_path`, or None if none was trained.
+
+    The artifact is read once per process and again only when it is
+    replaced. Raises ValueError if it was written by an incompatible version.
+    """
+    path = model_path(csv_path)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _lock:
+        cached = _models.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        with open(path) as f:
+            artifact = json.load(f)
+        if artifact.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"{path} has format version {artifact.get('format_version')}, expected "
+                             f"{FORMAT_VERSION}; retrain it with python risk_model.py")
+        model = RiskModel(artifact)
+        _models[path] = (mtime, model)
+        return model
+
+
+if __name__ == '__main__':
+    import query_backend
+    from data_loader import dataset_version
+
+    parser = argparse.ArgumentParser(description='Train the readmission risk model.')
+    parser.add_argument('--csv-path', default=DATA_PATH)
+    parser.add_argument('--backend', default='pandas', choices=query_backend.BACKENDS)
+    parser.add_argument('--l2', type=float, default=L2_PENALTY, help='L2 penalty on the coefficients')
+    args = parser.parse_args()
+
+    backend = query_backend.get_backend(args.backend, FEATURES + [TARGET], args.csv_path)
+    artifact = train(backend, args.l2, dataset_version(args.csv_path))
+    write_model(artifact, model_path(args.csv_path))
+    training = artifact['training']
+    print(f"Wrote {model_path(args.csv_path)} (model {artifact['model_version']}, {training['rows']} rows, "
+          f"AUC {training['auc']:.3f}, log loss {training['log_loss']:.4f})")
@@ -0,0 +1,145 @@
+"""Checks the aggregation engine, the summaries and the bitmap index against plain pandas."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import aggregates
+import aggregation
+import analytics
+from bitmap_index import BitmapIndex
+
+AGGREGATIONS = [
+    aggregation.count('by_readmitted', 'readmitted'),
+    aggregation.count('by_a1c_and_stay', 'A1CResult', 'HospitalStayLength'),
+    aggregation.count('by_lab_procedures', 'Diabetes_Med', 'num_lab_procedures'),
+    aggregation.mean('outpatient_by_a1c', 'Num_Outpatient', 'A1CResult', 'readmitted'),
+    aggregation.mean('medications_by_age', 'num_medications', 'age'),
+]
+
+
+def encounters(rows, seed=0):
+    """Returns `rows` random encounters with the columns of the summary and the Diagnostic view."""
+    rng = np.random.default_rng(seed)
+
+    def pick(values):
+        return rng.choice(values, rows)
+
+    data = pd.DataFrame({
+        'gender': pick(['Female', 'Male']),
+        'age': pick(['[40-50)', '[50-60)', '[60-70)', '[70-80)']),
+        'race': pick(['AfricanAmerican', 'Caucasian', 'Hispanic']),
+        'Admissiontype': pick(['Elective', 'Emergency', 'Urgent']),
+        'Discharge_type': pick(['Home', 'Transfer']),
+        'Diagnosis1': pick(['Circulatory', 'Diabetes', 'Respiratory']),
+        'Diagnosis': pick(['Depression', 'Hypertension', 'Obesity']),
+        'A1CResult': pick(['>7', '>8', 'Norm']).astype(object),
+        'Change': pick(['Ch', 'No']),
+        'Diabetes_Med': pick(['No', 'Yes']),
+        'Medication': pick(['insulin', 'metformin', 'glipizide']),
+        'HospitalStayLength': pick(['Long Stay', 'Short Stay']),
+        'age_group': pick(['Adults', 'Seniors']),
+        'readmitted': pick(['No', 'Yes']),
+        'time_in_hospital': rng.integers(1, 15, rows),
+        'num_lab_procedures': rng.integers(1, 40, rows),
+        'num_medications': rng.integers(1, 30, rows).astype(float),
+        'Num_Outpatient': rng.integers(0, 5, rows).astype(float),
+    })
+    # Missing values, which groupby() skips and the means leave out
+    data.loc[rng.random(rows) < 0.3, 'A1CResult'] = np.nan
+    data.loc[rng.random(rows) < 0.1, 'num_medications'] = np.nan
+    data.loc[rng.random(rows) < 0.1, 'Num_Outpatient'] = np.nan
+    return data
+
+
+def assert_same(result, expected):
+    assert result.index.tolist() == expected.index.tolist()
+    np.testing.assert_allclose(result.to_numpy(dtype=float), expected.to_numpy(dtype=float))
+
+
+def expected_results(data):
+    expected = {}
+    for declared in AGGREGATIONS:
+        groups = data.groupby(list(declared.by), observed=True)
+        expected[declared.name] = groups.size() if declared.value is None else groups[declared.value].mean()
+    return expected
+
+
+@pytest.mark.parametrize('categorical', [False, True])
+def test_run_matches_groupby(categorical):
+    data = encounters(2000)
+    if categorical:
+        data = data.astype({column: 'category' for column in data.columns if data[column].dtype == object})
+    results = aggregation.run(data, AGGREGATIONS)
+    for name, expected in expected_results(data).items():
+        assert_same(results[name], expected)
+
+
+def test_run_with_positions_matches_groupby_of_the_rows():
+    data = encounters(2000)
+    positions = np.flatnonzero(data['gender'] == 'Female')
+    codes = {column: aggregation.encode(data[column]) for column in ['A1CResult', 'readmitted']}
+    results = aggregation.run(data, AGGREGATIONS, positions, codes)
+    for name, expected in expected_results(data.iloc[positions]).items():
+        assert_same(results[name], expected)
+
+
+def test_folds_of_chunks_match_run():
+    data = encounters(3000)
+    folded = None
+    for start in range(0, len(data), 700):
+        part = aggregation.fold(data.iloc[start:start + 700], AGGREGATIONS)
+        folded = part if folded is None else aggregation.merge_folds(folded, part)
+    results = aggregation.run(data, AGGREGATIONS)
+    for name, result in aggregation.finish(folded, AGGREGATIONS).items():
+        assert_same(result, results[name])
+
+
+def test_merged_summaries_match_summary_of_concatenation():
+    first, second = encounters(1500, seed=1), encounters(900, seed=2)
+    merged = aggregates.merge_summaries(aggregates.build_summary(first, 'a'), aggregates.build_summary(second, 'b'), 'ab')
+    built = aggregates.build_summary(pd.concat([first, second], ignore_index=True), 'ab')
+
+    for key in ['format', 'version', 'total', 'readmitted_yes', 'counts']:
+        assert merged[key] == built[key]
+    assert merged['sums'] == pytest.approx(built['sums'])
+    for column in aggregates.VALUE_COUNT_COLUMNS:
+        assert dict(merged['value_counts'][column]) == dict(built['value_counts'][column])
+    assert dict(map(tuple, merged['medication_counts'])) == dict(map(tuple, built['medication_counts']))
+    assert [row[0] for row in merged['time_by_age']] == [row[0] for row in built['time_by_age']]
+    assert np.array(merged['time_by_age'])[:, 1:].astype(float) == pytest.approx(
+        np.array(built['time_by_age'])[:, 1:].astype(float))
+    for column in aggregates.MEAN_COLUMNS:
+        assert aggregates.mean(merged, column) == pytest.approx(built['sums'][column] / built['counts'][column])
+    for name, result in aggregates.diagnostic_results(merged).items():
+        assert_same(result, aggregates.diagnostic_results(built)[name])
+
+
+@pytest.mark.parametrize('filters', [
+    {},
+    {'gender': 'Female'},
+    {'age': ['[40-50)', '[70-80)'], 'readmitted': 'Yes'},
+    {'A1CResult': '>8', 'Diabetes_Med': ['Yes'], 'gender': 'Male'},
+    {'age': 'unknown'},
+])
+def test_bitmap_index_mask_matches_boolean_mask(filters):
+    # Built from the loader's frames, where text columns are categoricals
+    data = encounters(1003)
+    data = data.astype({column: 'category' for column in data.columns if data[column].dtype == object})
+    index = BitmapIndex(data, ['gender', 'age', 'readmitted', 'A1CResult', 'Diabetes_Med'])
+    expected = np.ones(len(data), dtype=bool)
+    for column, accepted in filters.items():
+        expected &= data[column].isin(accepted if isinstance(accepted, list) else [accepted]).to_numpy()
+    np.testing.assert_array_equal(index.positions(index.mask(filters)), np.flatnonzero(expected))
+
+
+def test_bootstrap_intervals_cover_the_true_proportions():
+    rng = np.random.default_rng(3)
+    true_proportions = np.array([0.2, 0.8])
+    counts = pd.DataFrame(rng.multinomial(400, true_proportions, size=300), columns=['Yes', 'No'])
+    intervals = analytics.bootstrap_intervals(counts, resamples=2000, confidence=0.95)
+
+    proportions = counts['Yes'] / counts.sum(axis=1)
+    lower, upper = intervals['lower']['Yes'], intervals['upper']['Yes']
+    assert (lower <= proportions).all() and (proportions <= upper).all()
+    coverage = ((lower <= true_proportions[0]) & (true_proportions[0] <= upper)).mean()
+    assert 0.90 <= coverage <= 0.99